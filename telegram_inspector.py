@@ -1,97 +1,285 @@
+import json
 import os
+import shutil
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
-def make_driver():
-    os.makedirs("./chrome-profile-telegram", exist_ok=True)
+CHROME_PROFILE_DIR = os.path.abspath("./chrome-profile-telegram")
+_DRIVER_PATH = None  # ChromeDriverManager().install() checks for updates over the network
+
+# Try all Telegram Web versions
+URLS_TO_TRY = [
+    "https://web.telegram.org/",
+    "https://web.telegram.org/k/",  # New version
+    "https://web.telegram.org/a/",  # Another version
+]
+
+# Anything that shows the page has rendered: the login screen or a chat list
+PAGE_READY_SELECTOR = "#auth-pages, #column-left, .chatlist, .chat-list, .im_dialogs_col"
+CHAT_LIST_SELECTOR = "#column-left, .chatlist, .chat-list, .im_dialogs_col"
+PAGE_LOAD_TIMEOUT = 15  # seconds; Telegram keeps fetching long after the DOM is usable
+
+# Assets the inspector never looks at; blocking them lets the page settle sooner
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.webp", "*.gif",
+    "*.mp4", "*.webm",
+    "*.woff", "*.woff2", "*.ttf",
+    "*google-analytics*", "*doubleclick*",
+]
+
+# Every Chrome flag the inspector launches with (besides the per-driver
+# profile and cache dirs)
+_BASE_FLAGS = (
+    # A large on-disk cache so Telegram's bundles survive between runs
+    "--disk-cache-size=268435456",
+    "--media-cache-size=67108864",
+    "--profile-directory=Default",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    # Small window at 1x scale: less to rasterize, and no resize call after launch
+    "--window-size=800,600",
+    "--force-device-scale-factor=1",
+    "--high-dpi-support=1",
+    # Keep the inspected tab from being throttled and skip background services
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-hang-monitor",
+    "--mute-audio",
+    "--disable-client-side-phishing-detection",
+    "--safebrowsing-disable-auto-update",
+    "--disable-features=TranslateUI,MediaRouter,OptimizationHints",
+    "--disable-extensions",
+    "--disable-sync",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-default-apps",
+)
+
+# Collects everything the inspector prints in a single WebDriver round-trip,
+# instead of a find_elements call plus three attribute reads per element
+INSPECT_DOM_SCRIPT = """
+const CHAT_RE = /chat/i;
+const CONTAINER_RE = /list|dialog|conversation/i;
+const chat = [], li = [], divs = [];
+// One walk over the tree instead of a case-insensitive querySelectorAll per bucket
+for (const e of document.querySelectorAll('*')) {
+    const cls = e.getAttribute('class') || '';
+    if (CHAT_RE.test(cls)) chat.push(e);
+    if (e.tagName === 'LI') li.push(e);
+    if (e.tagName === 'DIV' && CONTAINER_RE.test(cls)) divs.push(e);
+}
+const describe = (nodes) => nodes.slice(0, 10).map((e) => ({
+    tag: e.tagName.toLowerCase(),
+    cls: e.getAttribute('class') || '',
+    // textContent skips the layout flush that innerText (and Selenium's .text) forces
+    txt: (e.textContent || '').trim().slice(0, 100),
+}));
+return {
+    chat_n: chat.length, chat: describe(chat),
+    li_n: li.length, li: describe(li),
+    divs_n: divs.length, divs: describe(divs),
+    // Slice in the page so only 2000 chars cross the wire, not the whole document
+    source: document.documentElement.outerHTML.slice(0, 2000),
+};
+"""
+
+def get_driver_path():
+    global _DRIVER_PATH
+    if _DRIVER_PATH is None:
+        _DRIVER_PATH = ChromeDriverManager().install()
+    return _DRIVER_PATH
+
+def make_driver(headless=False, profile_dir=CHROME_PROFILE_DIR):
+    # Chrome can't share a cache between browser processes, so each profile
+    # (one per --parallel worker) gets its own
+    cache_dir = f"{profile_dir}-cache"
+    os.makedirs(profile_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
     options = webdriver.ChromeOptions()
-    options.add_argument("--user-data-dir=./chrome-profile-telegram")
-    options.add_argument("--profile-directory=Default")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument(f"--disk-cache-dir={cache_dir}")
+    for flag in _BASE_FLAGS:
+        options.add_argument(flag)
+    if headless:
+        # The new headless mode runs the full browser; the legacy shell is far slower
+        options.add_argument("--headless=new")
+    # Return from get() on DOMContentLoaded instead of waiting for every asset
+    options.page_load_strategy = "eager"
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(get_driver_path())
     driver = webdriver.Chrome(service=service, options=options)
-    driver.set_window_size(1200, 900)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    block_heavy_assets(driver)
     return driver
 
-def inspect_telegram():
-    driver = make_driver()
+def block_heavy_assets(driver):
+    """Block BLOCKED_URL_PATTERNS in the current tab (CDP settings are per tab)"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+def load_page(driver, url):
+    """
+    Start loading url in the current tab without waiting for it. Telegram Web
+    allows one active tab per profile and deactivates the others, so the
+    clients are loaded one after another in this tab, never side by side.
+    """
+    # Mark the current document, so wait_for_page_ready can't mistake the
+    # previous client (still rendered while the new one loads) for this one
+    driver.execute_cdp_cmd(
+        "Runtime.evaluate", {"expression": "window.__leaving = true"}
+    )
+    # Page.navigate returns once navigation starts, unlike driver.get()
+    driver.execute_cdp_cmd("Page.enable", {})
+    driver.execute_cdp_cmd("Page.navigate", {"url": url})
+
+def wait_for_page_ready(driver, timeout=PAGE_LOAD_TIMEOUT, poll=0.05):
+    """
+    Poll the current tab through CDP until it shows the login screen or a
+    chat list. Returns True when ready, False when the timeout is reached.
+    """
+    expression = (
+        "!window.__leaving && (location.href.includes('login') || "
+        f"!!document.querySelector({json.dumps(PAGE_READY_SELECTOR)}))"
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = driver.execute_cdp_cmd(
+            "Runtime.evaluate", {"expression": expression, "returnByValue": True}
+        )
+        if result.get("result", {}).get("value"):
+            return True
+        time.sleep(poll)
+    return False
+
+def format_elements(elements, show_tag=False):
+    """Format the element summaries returned by INSPECT_DOM_SCRIPT, one per line"""
+    return "\n".join(
+        f"  {i+1}. "
+        + (f"<{e['tag']}> " if show_tag else "")
+        + f"class='{e['cls'] or '(no class)'}' text='{e['txt'] or '(no text)'}'"
+        for i, e in enumerate(elements)
+    )
+
+def inspect_page(driver, url, allow_login=True, seen=None):
+    """
+    Inspect the already-loading page in the driver's current tab and print
+    the report as one block, so concurrent workers don't interleave output.
+    If a `seen` set is given, pages that ended up on an already inspected
+    client (same final URL and body classes) are skipped.
+    """
+    if not wait_for_page_ready(driver):
+        print(f"⚠️ {url}: page not ready after {PAGE_LOAD_TIMEOUT}s, stopping it and inspecting anyway")
+        driver.execute_script("window.stop();")
+    
+    if seen is not None:
+        body_class = driver.execute_script("return document.body ? document.body.className : ''")
+        key = (driver.current_url, body_class)
+        if key in seen:
+            print(f"\n⏭️ {url} redirected to {driver.current_url}, already inspected - skipping")
+            return
+        seen.add(key)
     
+    # Only ask for a manual login when the chat list does not show up on its own
     try:
-        # Try both Telegram versions
-        urls_to_try = [
-            "https://web.telegram.org/",
-            "https://web.telegram.org/k/",  # New version
-            "https://web.telegram.org/a/",  # Another version
-        ]
-        
-        for url in urls_to_try:
-            print(f"\n{'='*50}")
-            print(f"INSPECTING: {url}")
-            print(f"{'='*50}")
-            
-            driver.get(url)
-            time.sleep(3)
-            
-            print(f"Page title: {driver.title}")
-            print(f"Current URL: {driver.current_url}")
-            
-            # Check if we need to login
-            if "login" in driver.current_url.lower() or "auth" in driver.current_url.lower():
-                print("⚠️ Login required - please log in manually and press Enter")
-                input("Press Enter after logging in...")
-                time.sleep(5)
-            
-            # Find all elements with 'chat' in class name
-            chat_elements = driver.find_elements(By.CSS_SELECTOR, "[class*='chat' i]")
-            print(f"\nFound {len(chat_elements)} elements with 'chat' in class:")
-            for i, elem in enumerate(chat_elements[:10]):  # Show first 10
-                try:
-                    classes = elem.get_attribute("class")
-                    tag = elem.tag_name
-                    text = elem.text[:100] if elem.text else "(no text)"
-                    print(f"  {i+1}. <{tag}> class='{classes}' text='{text}'")
-                except:
-                    continue
-            
-            # Find all list items
-            list_items = driver.find_elements(By.CSS_SELECTOR, "li")
-            print(f"\nFound {len(list_items)} <li> elements:")
-            for i, elem in enumerate(list_items[:10]):  # Show first 10
-                try:
-                    classes = elem.get_attribute("class") or "(no class)"
-                    text = elem.text[:100] if elem.text else "(no text)"
-                    print(f"  {i+1}. class='{classes}' text='{text}'")
-                except:
-                    continue
-            
-            # Find all divs that might contain chats
-            divs = driver.find_elements(By.CSS_SELECTOR, "div[class*='list' i], div[class*='dialog' i], div[class*='conversation' i]")
-            print(f"\nFound {len(divs)} divs with list/dialog/conversation in class:")
-            for i, elem in enumerate(divs[:10]):
-                try:
-                    classes = elem.get_attribute("class")
-                    text = elem.text[:100] if elem.text else "(no text)"
-                    print(f"  {i+1}. class='{classes}' text='{text}'")
-                except:
-                    continue
-            
-            # Show page structure
-            print(f"\nPage source (first 2000 chars):")
-            print(driver.page_source[:2000])
-            
-            print(f"\n\nInspection complete for {url}")
-            response = input("Try next URL? (y/n): ").lower().strip()
-            if response != 'y':
-                break
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, CHAT_LIST_SELECTOR))
+        )
+    except TimeoutException:
+        if allow_login and any(t in driver.current_url.lower() for t in ("login", "auth")):
+            print(f"⚠️ {url}: login required - please log in manually and press Enter")
+            input("Press Enter after logging in...")
+            try:
+                WebDriverWait(driver, 60).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, CHAT_LIST_SELECTOR))
+                )
+            except TimeoutException:
+                print(f"⚠️ {url}: chat list not found after login, inspecting anyway")
+    
+    dom = driver.execute_script(INSPECT_DOM_SCRIPT)
+    
+    report = [
+        f"\n{'='*50}",
+        f"INSPECTING: {url}",
+        f"{'='*50}",
+        f"Page title: {driver.title}",
+        f"Current URL: {driver.current_url}",
+        f"\nFound {dom['chat_n']} elements with 'chat' in class:",
+        format_elements(dom["chat"], show_tag=True),
+        f"\nFound {dom['li_n']} <li> elements:",
+        format_elements(dom["li"]),
+        f"\nFound {dom['divs_n']} divs with list/dialog/conversation in class:",
+        format_elements(dom["divs"]),
+        # Show page structure
+        "\nPage source (first 2000 chars):",
+        dom["source"],
+        f"\n\nInspection complete for {url}",
+    ]
+    print("\n".join(line for line in report if line))
+
+def inspect_telegram(headless=False):
+    driver = make_driver(headless=headless)
+    
+    try:
+        seen = set()
+        for url in URLS_TO_TRY:
+            load_page(driver, url)
+            # Without a window there is no way to log in by hand
+            inspect_page(driver, url, allow_login=not headless, seen=seen)
                 
     finally:
         driver.quit()
 
+def copy_profile(profile_dir):
+    """
+    Refresh profile_dir from the main profile, so a worker starts with its
+    Telegram login. Caches and Chrome's lock files are left out.
+    """
+    if os.path.isdir(CHROME_PROFILE_DIR):
+        shutil.copytree(
+            CHROME_PROFILE_DIR,
+            profile_dir,
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns("Singleton*", "Cache", "Code Cache", "GPUCache"),
+        )
+
+def inspect_one(url, profile_suffix, headless=False):
+    """Inspect a single URL in its own Chrome process and a copy of the main profile"""
+    profile_dir = f"{CHROME_PROFILE_DIR}-{profile_suffix}"
+    copy_profile(profile_dir)
+    driver = make_driver(headless=headless, profile_dir=profile_dir)
+    try:
+        load_page(driver, url)
+        # Parallel workers can't share the terminal for a manual login
+        inspect_page(driver, url, allow_login=False)
+    finally:
+        driver.quit()
+
+def inspect_telegram_parallel(headless=False):
+    """
+    Inspect every URL concurrently, one driver per thread. Each worker runs
+    on a copy of the main profile and can't log in by hand, so log in once
+    with a normal run first; otherwise only the login screen is inspected.
+    """
+    get_driver_path()  # Resolve once up front rather than racing in every worker
+    n = len(URLS_TO_TRY)
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        list(executor.map(inspect_one, URLS_TO_TRY, range(n), [headless] * n))
+
 if __name__ == "__main__":
-    inspect_telegram()
\ No newline at end of file
+    # --headless runs Chrome without a window; logging in by hand is skipped.
+    # --parallel inspects every URL at once, using the main profile's login.
+    headless = "--headless" in sys.argv
+    if "--parallel" in sys.argv:
+        inspect_telegram_parallel(headless)
+    else:
+        inspect_telegram(headless)
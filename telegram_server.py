@@ -1,34 +1,328 @@
+import atexit
+import bisect
 import json
 import os
 import re
 import sqlite3
+import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.common.exceptions import (
     StaleElementReferenceException,
     TimeoutException,
+    WebDriverException,
 )
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+from urllib3.util.retry import Retry
 from webdriver_manager.chrome import ChromeDriverManager
 
+try:
+    # Optional: google-re2 matches in linear time, without backtracking
+    import re2
+except ImportError:
+    re2 = None
+
 # Configuration
 TELEGRAM_WEB = "https://web.telegram.org/"
 CHROME_PROFILE_DIR = os.path.abspath("./chrome-profile-telegram")
 DATABASE_FILE = "whats_app_telegram_contacts.db"
 BATCH_SIZE = 10  # Process chats in smaller batches
+DEBUG = os.environ.get("SCRAPE_DEBUG") == "1"  # Verbose API response logging
+# Characters of the cleaned phone ("+" and separators count); shorter aren't verified
+MIN_PHONE_LENGTH = 12
+# Set CHROMEDRIVER to a chromedriver binary to skip ChromeDriverManager's
+# update check, which goes over the network on every launch
+_DRIVER_PATH = os.environ.get("CHROMEDRIVER")
+
+# Precompiled patterns (chat text is ASCII-matched, so re.ASCII keeps classes small)
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", re.ASCII)
+# Common phone number formats in one alternation, most specific first
+PHONE_RE = re.compile(
+    r"\+\d{1,4}[\s\-]?\d{6,14}"  # International format
+    r"|\(\d{3}\)\s?\d{3}[\s\-]?\d{4}"  # US format (xxx) xxx-xxxx
+    r"|\d{3}[\s\-]?\d{3}[\s\-]?\d{4}"  # US format xxx-xxx-xxxx
+    r"|\d{10,15}",  # Simple 10-15 digit numbers
+    re.ASCII,
+)
+# Emails and phones in a single scan; the matching group names which was found.
+# The email local part can rescan long runs of text, so prefer RE2 when installed
+# (its \d and \s are ASCII-only already).
+CONTACT_PATTERN = f"(?P<email>{EMAIL_RE.pattern})|(?P<phone>{PHONE_RE.pattern})"
+CONTACT_RE = (
+    re2.compile(CONTACT_PATTERN) if re2 else re.compile(CONTACT_PATTERN, re.ASCII)
+)
+TIME_RE = re.compile(r"\d{1,2}:\d{2}\s*(?:AM|PM)", re.ASCII)  # Chat list timestamps
+DIGIT_RUN_RE = re.compile(r"\d{3}", re.ASCII)
+PHONE_CLEAN_RE = re.compile(r"[^\d\s\-\(\)\+]", re.ASCII)
+
+# Keep-alive session so each verification reuses the API connection
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers.update(
+    {"Content-Type": "application/json", "Accept": "application/json"}
+)
+HTTP_SESSION.mount(
+    "http://",
+    HTTPAdapter(pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.3)),
+)
+HTTP_TIMEOUT = (3, 10)  # (connect, read) seconds
+# Runs verify_contact in the background while the next chats are scraped.
+# Pending work is drained at interpreter exit, before atexit handlers run.
+VERIFY_POOL = ThreadPoolExecutor(max_workers=4)
+
+# Fallback chat name elements, for rows whose text doesn't start with the name
+CHAT_NAME_SELECTORS = [
+    ".chat-title",
+    ".peer-title",
+    "h3",
+    ".name",
+    "[class*='title']",
+    "[class*='name']",
+]
+
+# Returns the first selector (of arguments[0]) that has visible chats with text,
+# plus those chats' elements, text and the text of their first non-empty name
+# element (of arguments[1]), so the chat list costs one round-trip
+VISIBLE_CHATS_SCRIPT = """
+const [selectors, nameSelectors] = arguments;
+const titleOf = (row) => {
+    for (const sel of nameSelectors) {
+        const el = row.querySelector(sel);
+        const title = el ? (el.innerText || '').trim() : '';
+        if (title) return title;
+    }
+    return '';
+};
+for (const selector of selectors) {
+    const chats = [];
+    for (const e of document.querySelectorAll(selector)) {
+        // Same visibility rule Selenium's is_displayed() applies, minus the round-trip
+        if (e.offsetParent === null) continue;
+        const rect = e.getBoundingClientRect();
+        if (rect.height <= 10 || rect.width <= 0) continue;
+        const text = (e.innerText || '').trim();
+        if (text.length <= 1) continue;
+        // Stable peer id: on the row, on its avatar, or in the row link's #hash
+        const peer = e.closest('[data-peer-id]') || e.querySelector('[data-peer-id]');
+        const link = e.querySelector('a[href^="#"]');
+        const id = (peer && peer.getAttribute('data-peer-id'))
+            || (link && link.getAttribute('href').slice(1))
+            || e.id || null;
+        chats.push({element: e, text: text, id: id, title: titleOf(e)});
+    }
+    if (chats.length) return {selector: selector, chats: chats};
+}
+return {selector: null, chats: []};
+"""
+
+# Any rendered message bubble in the open chat
+MESSAGE_SELECTOR = ".Message, .message"
+# The open chat's message list (web A, web K) and header title
+MESSAGE_LIST_SELECTOR = ".MessageList, .bubbles-inner"
+CHAT_HEADER_TITLE_SELECTOR = (
+    ".MiddleHeader .ChatInfo .title, .MiddleHeader .fullName, .chat-info .peer-title"
+)
+
+# Remembers the chat on screen before a click: its message list, that list's
+# last message and the header (title, peer id, URL hash), so the wait after
+# the click can tell whether the clicked chat is the one already open
+MARK_MESSAGE_LIST_SCRIPT = """
+const [listSelector, headerSelector, messageSelector] = arguments;
+const list = document.querySelector(listSelector);
+const messages = list ? list.querySelectorAll(messageSelector) : [];
+const header = document.querySelector(headerSelector);
+const peerEl = header && header.closest('[data-peer-id]');
+window.__prevMessageList = list;
+window.__prevLastMessage = messages.length ? messages[messages.length - 1] : null;
+window.__prevChat = {
+    title: header ? (header.innerText || '').trim() : null,
+    peer: peerEl ? peerEl.getAttribute('data-peer-id') : null,
+    hash: decodeURIComponent(location.hash.slice(1)),
+};
+window.__openMessageList = null;
+"""
+
+# True once the header shows the clicked chat (title arguments[2] or peer id
+# arguments[3]). If that chat was already open, the header is enough.
+# Otherwise the previous chat's messages must be gone: a message list other
+# than the marked one has messages, or the marked list (reused by the client)
+# no longer holds its last message. That list is kept for LAST_MESSAGES_SCRIPT.
+CHAT_OPENED_SCRIPT = """
+const [listSelector, headerSelector, name, peerId, messageSelector] = arguments;
+const header = document.querySelector(headerSelector);
+if (!header) return false;
+const title = (header.innerText || '').trim();
+const peerEl = header.closest('[data-peer-id]');
+const headerPeer = peerEl && peerEl.getAttribute('data-peer-id');
+const hash = decodeURIComponent(location.hash.slice(1));
+const isClicked = (t, p, h) => t === name || (!!peerId && (p === peerId || h === peerId));
+if (!isClicked(title, headerPeer, hash)) return false;
+const before = window.__prevChat;
+const prev = window.__prevMessageList;
+if (before && isClicked(before.title, before.peer, before.hash)) {
+    window.__openMessageList = document.querySelector(listSelector);
+    return true;
+}
+const last = window.__prevLastMessage;
+for (const list of document.querySelectorAll(listSelector)) {
+    if (!list.querySelector(messageSelector)) continue;
+    const reused = prev && prev.isConnected && list === prev;
+    if (reused && last && list.contains(last)) continue;
+    window.__openMessageList = list;
+    return true;
+}
+return false;
+"""
+
+# Last arguments[1] messages with meaningful text for the first selector (of
+# arguments[0]) that has any, oldest first, in the opened chat's message list.
+# Direction comes from the nearest message ancestor's classes ("own"/"out"
+# mark outgoing messages).
+LAST_MESSAGES_SCRIPT = """
+const [selectors, limit] = arguments;
+// Only the list of the chat that was just opened, when the click wait found it
+const open = window.__openMessageList;
+const root = open && open.isConnected ? open : document;
+for (const selector of selectors) {
+    const found = [];
+    for (const e of root.querySelectorAll(selector)) {
+        const body = (e.innerText || '').trim();
+        if (body.length > 2) found.push([e, body]);
+    }
+    if (!found.length) continue;
+    return {
+        selector: selector,
+        count: found.length,
+        messages: found.slice(-limit).map(([e, body]) => {
+            const parent = e.parentElement
+                && e.parentElement.closest("[class*='Message'], [class*='message']");
+            const cls = parent ? (parent.getAttribute('class') || '').toLowerCase() : '';
+            return {body: body, direction: /own|out/.test(cls) ? 'out' : 'in'};
+        }),
+    };
+}
+return {selector: null, count: 0, messages: []};
+"""
+
+# The first selector (of arguments[0]) that matches, its element and the start
+# of the element's HTML, so probing the container selectors is one round-trip
+CHAT_CONTAINER_SCRIPT = """
+for (const selector of arguments[0]) {
+    const el = document.querySelector(selector);
+    if (el) return {selector: selector, element: el, html: el.outerHTML.slice(0, 500)};
+}
+return null;
+"""
+
+# Installs (once per chat list element) a MutationObserver that flags any
+# change under the chat list matching arguments[0], and clears the flag.
+# Returns false if there is no chat list to watch.
+WATCH_CHAT_LIST_SCRIPT = """
+const list = document.querySelector(arguments[0]);
+if (!list) return false;
+window.__chatListChanged = false;
+if (window.__chatObserver && window.__chatObserverList === list) return true;
+if (window.__chatObserver) window.__chatObserver.disconnect();
+window.__chatObserver = new MutationObserver(() => { window.__chatListChanged = true; });
+window.__chatObserver.observe(list, {childList: true, characterData: true, subtree: true});
+window.__chatObserverList = list;
+return true;
+"""
+# Hands over and clears the change flag; a replaced chat list counts as a change
+CHAT_LIST_CHANGED_SCRIPT = """
+const changed = window.__chatListChanged === true;
+window.__chatListChanged = false;
+const list = window.__chatObserverList;
+return changed || !list || !list.isConnected;
+"""
+FULL_SCAN_INTERVAL = 30  # seconds; the longest wait between scans
+CHAT_POLL_INTERVAL = 0.5  # seconds between checks of the change flag
+
+# Scrolls the container (arguments[0]) to the top; returns whether it moved
+SCROLL_TO_TOP_SCRIPT = """
+const el = arguments[0];
+if (!el || el.scrollTop === 0) return false;
+el.scrollTop = 0;
+return true;
+"""
+
+# Text of the last chat row matching arguments[0]; changes once scrolling renders new rows
+LAST_CHAT_TEXT_SCRIPT = """
+const items = document.querySelectorAll(arguments[0]);
+return items.length ? items[items.length - 1].innerText : '';
+"""
+
+# Everything debug_page_structure prints, for the selectors in arguments[0]
+DEBUG_PAGE_SCRIPT = """
+const sidebar = document.querySelector(
+    ".sidebar-left, .left-column, [class*='sidebar'], [class*='left']"
+);
+return {
+    title: document.title,
+    url: location.href,
+    selectors: arguments[0].map((selector) => {
+        const els = document.querySelectorAll(selector);
+        return {
+            selector: selector,
+            count: els.length,
+            samples: Array.from(els).slice(0, 3).map((e) => ({
+                cls: e.getAttribute('class') || 'no-class',
+                text: (e.innerText || '').slice(0, 51),
+            })),
+        };
+    }),
+    sidebar: sidebar ? sidebar.outerHTML.slice(0, 1000) : null,
+};
+"""
+
+
+# Selectors that last matched; tried first since only one matches after login
+_last_container_selector = None
+_last_chat_selector = None
+
+_CONN = None  # Shared connection, opened lazily by get_connection()
+_DB_LOCK = threading.Lock()  # Serializes use of the shared connection across threads
+
+
+def connect_database():
+    """Open a database connection tuned for the WAL journal set up in init_database"""
+    # Autocommit mode; multi-statement writes open their own transaction
+    conn = sqlite3.connect(DATABASE_FILE, isolation_level=None, check_same_thread=False)
+    # Wait on the WAL writer lock instead of failing with "database is locked"
+    conn.execute("PRAGMA busy_timeout=5000")
+    # WAL only needs an fsync at checkpoints, so NORMAL is still crash-safe
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    # Reads come straight from the mapped file instead of copies into the page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
+def get_connection():
+    """Return the process-wide database connection, opening it on first use"""
+    global _CONN
+    if _CONN is None:
+        _CONN = connect_database()
+        atexit.register(_CONN.close)
+    return _CONN
 
 
 def init_database():
     """Initialize SQLite database and create table if not exists"""
-    conn = sqlite3.connect(DATABASE_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
 
+    # WAL is persistent on the file, so this only needs to run once
+    cursor.execute("PRAGMA journal_mode=WAL")
+
     # First, create the table with the new structure
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS contacts (
@@ -57,95 +351,80 @@ def init_database():
         cursor.execute("ALTER TABLE contacts ADD COLUMN chat_name TEXT")
         print("✓ Added chat_name column to existing table")
 
-    conn.commit()
-    conn.close()
+    # Lets the duplicate check in verify_contact run as an index-only lookup
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_contacts_email_verified "
+        "ON contacts(email, is_verified)"
+    )
+    cursor.execute("ANALYZE")
+
     print(f"✓ Database initialized: {DATABASE_FILE}")
 
 
-def save_contact(phone, email):
+def verify_contact(phone, email):
     """
-    Save phone and email to database with is_verified set to False
-    Only saves if both phone and email are provided
-    Returns True if saved, False if already exists or invalid data
+    Verify phone and email with the API without writing to the database
+    Only verifies if both phone and email are provided
+    Returns a (phone, email, is_replaced) row for save_contacts_bulk,
+    or None if already saved, invalid or not verified
     """
     if not phone or not email:
         print("❌ Both phone and email are required")
-        return False
-    if len(phone) < 12:
+        return None
+    if len(phone) < MIN_PHONE_LENGTH:
         print("Phone number is not valid")
-        return False
+        return None
 
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
 
         # Check if this combination already exists
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM contacts 
-            WHERE email = ?
-            AND is_verified = 1
-        """,
-            (email,),
-        )
+        with _DB_LOCK:
+            cursor.execute(
+                """
+                SELECT 1 FROM contacts 
+                WHERE email = ?
+                AND is_verified = 1
+                LIMIT 1
+            """,
+                (email,),
+            )
+            exists = cursor.fetchone()
 
-        if cursor.fetchone()[0] > 0:
+        if exists:
             print(f"⚠️  Contact already exists: {phone} - {email}")
-            conn.close()
-            return False
+            return None
         url = (
             "http://api.topofstacksoftware.com/quran-hadith/api/verify-by-whatsapp-text"
         )
 
-        # Request payload
+        # Request payload, encoded once here instead of inside requests
         payload = {"key": "9ej33TVT1", "cell": phone, "email": email}
-
-        # Headers (optional, but good practice)
-        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        data = json.dumps(payload).encode()
 
         try:
-            # Make the POST request
-            response = requests.post(url, json=payload, headers=headers)
+            # Make the POST request (JSON headers are set on the session)
+            response = HTTP_SESSION.post(url, data=data, timeout=HTTP_TIMEOUT)
 
             # Print response status code
             print(f"Status Code: {response.status_code}")
 
-            # Print response headers
-            print(f"Response Headers: {dict(response.headers)}")
+            if DEBUG:
+                print(f"Response Headers: {dict(response.headers)}")
 
             # Try to parse JSON response
             try:
                 response_data = response.json()
-                print(f"Response JSON: {json.dumps(response_data, indent=2)}")
+                if DEBUG:
+                    print(f"Response JSON: {json.dumps(response_data, indent=2)}")
             except json.JSONDecodeError:
                 print(f"Response Text: {response.text}")
 
             # Check if request was successful
             if response.status_code == 200:
                 print("✅ Request successful!")
-                is_replaced = response_data.get("is_replaced", None)
-                if is_replaced == "true":
-                    cursor.execute(
-                        """
-                        UPDATE contacts 
-                        SET is_verified = ? 
-                        WHERE phone = ?
-                        """,
-                        (False, phone),
-                    )
-                    conn.commit()
-                    print("✅ Email replaced")
-                cursor.execute(
-                    """
-                    INSERT INTO contacts (phone, email, is_verified) 
-                    VALUES (?, ?, ?)
-                """,
-                    (phone, email, True),
-                )
-                conn.commit()
-                print(f"✅ New contact saved: {phone} - {email} (verified: True)")
-                conn.close()
-                return True
+                is_replaced = response_data.get("is_replaced", None) == "true"
+                return (phone, email, is_replaced)
             else:
                 print(f"❌ Request failed with status code: {response.status_code}")
 
@@ -154,88 +433,85 @@ def save_contact(phone, email):
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
 
-    except sqlite3.IntegrityError:
-        print(f"⚠️  Contact already exists: {phone} - {email}")
-        return False
     except Exception as e:
-        print(f"❌ Error saving contact: {e}")
-        return False
-
-
-def get_all_contacts():
-    """Get all contacts from database"""
-    try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        print(f"❌ Error verifying contact: {e}")
+    return None
 
-        cursor.execute("""
-            SELECT phone, email, chat_name, is_verified, created_at FROM contacts 
-            ORDER BY created_at DESC
-        """)
 
-        contacts = cursor.fetchall()
-        conn.close()
+def save_contacts_bulk(rows):
+    """
+    Save verified (phone, email, is_replaced) rows in a single transaction
+    Contacts whose email is already stored are skipped
+    Returns the number of new contacts saved
+    """
+    if not rows:
+        return 0
 
-        return contacts
+    conn = get_connection()
+    try:
+        with _DB_LOCK:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Row by row, in order, so a replaced email only clears the
+                # contacts saved before it, as separate saves would
+                saved = 0
+                for phone, email, is_replaced in rows:
+                    if is_replaced:
+                        # The phone's previous contacts are no longer verified
+                        conn.execute(
+                            """
+                            UPDATE contacts 
+                            SET is_verified = 0 
+                            WHERE phone = ?
+                            """,
+                            (phone,),
+                        )
+                    # UNIQUE(email) decides duplicates; no IntegrityError round trip
+                    cursor = conn.execute(
+                        """
+                        INSERT OR IGNORE INTO contacts (phone, email, is_verified) 
+                        VALUES (?, ?, 1)
+                    """,
+                        (phone, email),
+                    )
+                    saved += cursor.rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        print(f"✅ Saved {saved} of {len(rows)} verified contacts")
+        return saved
     except Exception as e:
-        print(f"❌ Error retrieving contacts: {e}")
-        return []
+        print(f"❌ Error saving contacts: {e}")
+        return 0
 
 
-def update_verification_status(email, is_verified=True):
+def get_contact_stats(latest=3):
     """
-    Update the verification status of a contact by email
+    Get (total, verified, latest_contacts) without reading the whole table
+    latest_contacts holds the newest rows as
+    (phone, email, chat_name, is_verified, created_at)
     """
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            UPDATE contacts 
-            SET is_verified = ? 
-            WHERE email = ?
-        """,
-            (is_verified, email),
-        )
-
-        if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
-            print(f"✅ Updated verification status for {email}: {is_verified}")
-            return True
-        else:
-            conn.close()
-            print(f"⚠️  No contact found with email: {email}")
-            return False
-
+        cursor = get_connection().cursor()
+
+        with _DB_LOCK:
+            cursor.execute("SELECT COUNT(*), SUM(is_verified = 1) FROM contacts")
+            total, verified = cursor.fetchone()
+            # id follows insertion order and is the primary key, so no sort is needed
+            cursor.execute(
+                """
+                SELECT phone, email, chat_name, is_verified, created_at FROM contacts 
+                ORDER BY id DESC
+                LIMIT ?
+            """,
+                (latest,),
+            )
+            return total, verified or 0, cursor.fetchall()
     except Exception as e:
-        print(f"❌ Error updating verification status: {e}")
-        return False
-
-
-def extract_email_from_text(text):
-    """Extract email from text using regex"""
-    pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-    match = re.search(pattern, text)
-    return match.group() if match else None
-
-
-def extract_phone_from_text(text):
-    """Extract phone number from text using regex"""
-    # Common phone number patterns
-    patterns = [
-        r"\+\d{1,4}[\s\-]?\d{6,14}",  # International format
-        r"\(\d{3}\)\s?\d{3}[\s\-]?\d{4}",  # US format (xxx) xxx-xxxx
-        r"\d{3}[\s\-]?\d{3}[\s\-]?\d{4}",  # US format xxx-xxx-xxxx
-        r"\d{10,15}",  # Simple 10-15 digit numbers
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group()
-    return None
+        print(f"❌ Error retrieving contact stats: {e}")
+        return 0, 0, []
 
 
 def clean_phone_number(phone_text):
@@ -243,16 +519,21 @@ def clean_phone_number(phone_text):
     if not phone_text:
         return None
 
-    # Remove common prefixes and clean the phone number
-    phone = phone_text.strip()
+    # Keep only numbers and some special chars (including + sign); one strip
+    # afterwards also covers whitespace that was at the ends of phone_text
+    phone = PHONE_CLEAN_RE.sub("", phone_text).strip()
+
+    return phone or None
 
-    # Extract only numbers and some special chars (including + sign)
-    phone = re.sub(r"[^\d\s\-\(\)\+]", "", phone)
 
-    return phone.strip() if phone else None
+def get_driver_path():
+    global _DRIVER_PATH
+    if _DRIVER_PATH is None:
+        _DRIVER_PATH = ChromeDriverManager().install()
+    return _DRIVER_PATH
 
 
-def make_driver():
+def make_driver(headless=False):
     os.makedirs(CHROME_PROFILE_DIR, exist_ok=True)
     options = webdriver.ChromeOptions()
     options.add_argument(f"--user-data-dir={CHROME_PROFILE_DIR}")
@@ -260,16 +541,25 @@ def make_driver():
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
+    # Set at launch instead of a set_window_size call afterwards
+    options.add_argument("--window-size=1200,900")
+    options.add_argument("--disable-features=Translate,MediaRouter,OptimizationHints")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    if headless:
+        # Only once the profile is logged in: the login needs a visible window
+        options.add_argument("--headless=new")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
+    # Return from get() on DOMContentLoaded; wait_for_login waits for the chat list
+    options.page_load_strategy = "eager"
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(get_driver_path())
     driver = webdriver.Chrome(service=service, options=options)
     driver.execute_script(
         "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
     )
-    driver.set_window_size(1200, 900)
     return driver
 
 
@@ -300,9 +590,14 @@ def wait_for_login(driver, timeout=180):
         )
         print("✓ Login successful!")
 
-        # Add a pause to let everything load
-        print("Waiting 5 seconds for full page load...")
-        time.sleep(5)
+        # The list container can appear before its rows; wait for the first chat
+        print("Waiting for the chat list to load...")
+        try:
+            WebDriverWait(driver, 10, poll_frequency=0.2).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".ListItem.Chat"))
+            )
+        except TimeoutException:
+            print("⚠️ No chats rendered yet, continuing")
 
         return True
     except TimeoutException:
@@ -326,40 +621,36 @@ def get_chat_container(driver):
         "[class*='scroll']",
     ]
 
+    global _last_container_selector
+    if _last_container_selector:
+        chat_container_selectors.remove(_last_container_selector)
+        chat_container_selectors.insert(0, _last_container_selector)
+
     print("\n🔍 Looking for chat container...")
-    for i, selector in enumerate(chat_container_selectors):
-        try:
-            print(f"Trying container selector {i + 1}: {selector}")
-            container = driver.find_element(By.CSS_SELECTOR, selector)
-            if container:
-                print(f"✓ Found chat container with selector: {selector}")
+    found = driver.execute_script(CHAT_CONTAINER_SCRIPT, chat_container_selectors)
+    if found:
+        print(f"✓ Found chat container with selector: {found['selector']}")
+        _last_container_selector = found["selector"]
 
-                # Check if container has any content
-                container_html = container.get_attribute("outerHTML")[:500]
-                print(f"Container preview: {container_html}...")
+        # Check if container has any content
+        print(f"Container preview: {found['html']}...")
 
-                return container
-        except Exception as e:
-            print(f"  Failed: {e}")
-            continue
+        return found["element"]
 
-    print("⚠️ Chat container not found with any selector")
+    print(
+        f"⚠️ Chat container not found with any of {len(chat_container_selectors)} selectors"
+    )
     return None
 
 
 def debug_page_structure(driver):
-    """Debug function to inspect the page structure"""
+    """Debug function to inspect the page structure (only runs with SCRAPE_DEBUG=1)"""
+    if not DEBUG:
+        return
+
     print("\n🔍 DEBUG: Inspecting page structure...")
 
     try:
-        # Get page title
-        title = driver.title
-        print(f"Page title: {title}")
-
-        # Get current URL
-        current_url = driver.current_url
-        print(f"Current URL: {current_url}")
-
         # Try to find any elements that might contain chats
         debug_selectors = [
             "div",
@@ -372,39 +663,25 @@ def debug_page_structure(driver):
             "[class*='message']",
         ]
 
-        for selector in debug_selectors:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                if len(elements) > 0:
-                    print(f"Found {len(elements)} elements with selector: {selector}")
-
-                    # Show first few elements' classes and text
-                    for i, elem in enumerate(elements[:3]):
-                        try:
-                            classes = elem.get_attribute("class") or "no-class"
-                            text = (
-                                elem.text[:50] + "..."
-                                if len(elem.text) > 50
-                                else elem.text
-                            )
-                            print(
-                                f"  Element {i + 1}: class='{classes}', text='{text}'"
-                            )
-                        except:
-                            continue
-            except:
-                continue
+        page = driver.execute_script(DEBUG_PAGE_SCRIPT, debug_selectors)
+        print(f"Page title: {page['title']}")
+        print(f"Current URL: {page['url']}")
 
-        # Try to get the HTML structure of sidebar
-        try:
-            sidebar = driver.find_element(
-                By.CSS_SELECTOR,
-                ".sidebar-left, .left-column, [class*='sidebar'], [class*='left']",
-            )
-            if sidebar:
-                print("\nSidebar HTML structure (first 1000 chars):")
-                print(sidebar.get_attribute("outerHTML")[:1000] + "...")
-        except:
+        for found in page["selectors"]:
+            if found["count"] > 0:
+                print(f"Found {found['count']} elements with selector: {found['selector']}")
+
+                # Show first few elements' classes and text
+                for i, sample in enumerate(found["samples"]):
+                    text = sample["text"]
+                    text = text[:50] + "..." if len(text) > 50 else text
+                    print(f"  Element {i + 1}: class='{sample['cls']}', text='{text}'")
+
+        # HTML structure of sidebar
+        if page["sidebar"]:
+            print("\nSidebar HTML structure (first 1000 chars):")
+            print(page["sidebar"] + "...")
+        else:
             print("No sidebar found")
 
     except Exception as e:
@@ -412,7 +689,10 @@ def debug_page_structure(driver):
 
 
 def get_current_visible_chats(driver):
-    """Get currently visible chat elements in the viewport"""
+    """
+    Get currently visible chats in the viewport
+    Returns dicts with the chat's WebElement and its text, read in one script call
+    """
 
     # First run debug if no chats found
     debug_page_structure(driver)
@@ -434,41 +714,32 @@ def get_current_visible_chats(driver):
         "[class*='chat-list'] div",
     ]
 
-    print(f"\n🔍 Trying {len(chat_selectors)} different selectors...")
+    global _last_chat_selector
+    if _last_chat_selector:
+        chat_selectors.remove(_last_chat_selector)
+        chat_selectors.insert(0, _last_chat_selector)
 
-    for i, selector in enumerate(chat_selectors):
-        try:
-            print(f"Trying selector {i + 1}: {selector}")
-            chat_items = driver.find_elements(By.CSS_SELECTOR, selector)
-            print(f"  Found {len(chat_items)} elements")
-
-            if chat_items:
-                # Filter out only visible elements with meaningful content
-                visible_chats = []
-                for j, chat in enumerate(chat_items):
-                    try:
-                        if chat.is_displayed() and chat.size["height"] > 10:
-                            # Check if it has any text content that looks like a chat
-                            text = chat.text.strip()
-                            if text and len(text) > 1:
-                                visible_chats.append(chat)
-                                if j < 3:  # Show first 3 for debugging
-                                    print(f"    Chat {j + 1}: {text[:50]}...")
-                    except StaleElementReferenceException:
-                        continue
-                    except Exception as e:
-                        print(f"    Error checking chat {j}: {e}")
-
-                if visible_chats:
-                    print(
-                        f"✓ Found {len(visible_chats)} visible chats with selector: {selector}"
-                    )
-                    return visible_chats
-                else:
-                    print("  No visible chats with meaningful content")
-        except Exception as e:
-            print(f"  Error with selector {selector}: {e}")
-            continue
+    if DEBUG:
+        print(f"\n🔍 Trying {len(chat_selectors)} different selectors...")
+
+    try:
+        result = driver.execute_script(
+            VISIBLE_CHATS_SCRIPT, chat_selectors, CHAT_NAME_SELECTORS
+        )
+    except Exception as e:
+        print(f"  Error reading chat list: {e}")
+        result = None
+
+    if result and result["chats"]:
+        visible_chats = result["chats"]
+        _last_chat_selector = result["selector"]
+        if DEBUG:
+            for j, chat in enumerate(visible_chats[:3]):  # Show first 3 for debugging
+                print(f"    Chat {j + 1}: {chat['text'][:50]}...")
+        print(
+            f"✓ Found {len(visible_chats)} visible chats with selector: {result['selector']}"
+        )
+        return visible_chats
 
     print("⚠️ No visible chats found with any selector")
 
@@ -476,71 +747,53 @@ def get_current_visible_chats(driver):
     try:
         print("\n📄 Page source sample (first 2000 chars):")
         print(driver.page_source[:2000] + "...")
-    except:
+    except WebDriverException:
         pass
 
     return []
 
 
-def extract_chat_data(chat_element):
-    """Extract data from a single chat element"""
+def extract_chat_data(chat):
+    """Extract data from a chat returned by get_current_visible_chats"""
     try:
+        chat_element = chat["element"]
+
         # Get chat name - based on your actual structure
         chat_name = "Unknown"
 
         # Your structure shows text content directly in the ListItem
-        full_text = chat_element.text.strip()
+        full_text = chat["text"]
+
+        # The format appears to be: "Name\nTime\nMessage preview"
+        first_line, has_second, rest = full_text.partition("\n")
+        second_line, has_tail, tail = rest.partition("\n")
+        second_line = second_line.strip()
 
         if full_text:
-            # The format appears to be: "Name\nTime\nMessage preview"
-            lines = full_text.split("\n")
-            if lines:
-                # First line is usually the chat name
-                chat_name = lines[0].strip()
-
-                # If first line looks like a time, try second line
-                if ":" in chat_name and ("AM" in chat_name or "PM" in chat_name):
-                    if len(lines) > 1:
-                        chat_name = lines[1].strip()
-
-        # Try specific selectors for chat name as fallback
-        if chat_name == "Unknown" or not chat_name:
-            name_selectors = [
-                ".chat-title",
-                ".peer-title",
-                "h3",
-                ".name",
-                "[class*='title']",
-                "[class*='name']",
-            ]
-
-            for name_sel in name_selectors:
-                try:
-                    name_el = chat_element.find_element(By.CSS_SELECTOR, name_sel)
-                    name = name_el.text.strip()
-                    if name:
-                        chat_name = name
-                        break
-                except:
-                    continue
+            # First line is usually the chat name
+            chat_name = first_line.strip()
+
+            # If first line looks like a time, try second line
+            if has_second and TIME_RE.search(chat_name):
+                chat_name = second_line
+
+        # Fall back to the name element VISIBLE_CHATS_SCRIPT read in the page
+        if (chat_name == "Unknown" or not chat_name) and chat.get("title"):
+            chat_name = chat["title"]
 
         # Get last message preview from the full text
         last_message = ""
-        if full_text:
-            lines = full_text.split("\n")
-            if len(lines) > 2:
-                # Usually the last line or lines contain the message
-                last_message = "\n".join(lines[2:]).strip()
-            elif len(lines) > 1:
-                # Check if second line is not a time
-                second_line = lines[1].strip()
-                if not (
-                    ":" in second_line and ("AM" in second_line or "PM" in second_line)
-                ):
-                    last_message = second_line
+        if has_tail:
+            # Usually the last line or lines contain the message
+            last_message = tail.strip()
+        elif has_second and not TIME_RE.search(second_line):
+            # Second line is the message unless it is a time
+            last_message = second_line
 
         return {
             "chat_name": chat_name,
+            # Peer id when the page exposes one; two chats can share a name
+            "id": chat.get("id") or chat_name,
             "last_message": last_message or "No preview available",
             "element": chat_element,  # Keep reference for clicking
         }
@@ -553,91 +806,144 @@ def extract_chat_data(chat_element):
 
 
 def scroll_down_and_get_chats(driver, container, scroll_amount=3):
-    """Scroll down a bit and get newly visible chats"""
+    """
+    Scroll down a bit so newly visible chats get rendered
+    The caller reads them with its next get_current_visible_chats call
+    """
     try:
+        chat_selector = _last_chat_selector or ".ListItem.Chat"
+        last_chat_text = driver.execute_script(LAST_CHAT_TEXT_SCRIPT, chat_selector)
+
         # Scroll down gradually
         for _ in range(scroll_amount):
             driver.execute_script(
                 "arguments[0].scrollTop += arguments[0].clientHeight * 0.3", container
             )
-            time.sleep(0.3)
+            time.sleep(0.05)  # Debounce so the virtual list renders between steps
 
-        # Wait for content to load
-        time.sleep(0.8)
-
-        # Get currently visible chats
-        return get_current_visible_chats(driver)
+        # Wait for content to load: new rows at the bottom of the list
+        wait_for_chat_list_change(driver, chat_selector, last_chat_text)
 
     except Exception as e:
         print(f"Error scrolling: {e}")
-        return []
 
 
-def click_chat_element(driver, chat_element, chat_name):
-    """Click on a chat element with error handling"""
+def wait_for_chat_list_change(driver, chat_selector, last_chat_text, timeout=1.5):
+    """Wait until the last rendered chat row no longer has last_chat_text"""
     try:
-        # Check if element is still valid
-        if not chat_element.is_displayed():
-            return False
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(LAST_CHAT_TEXT_SCRIPT, chat_selector)
+            != last_chat_text
+        )
+    except TimeoutException:
+        pass  # Nothing new rendered, e.g. already at the bottom
+
+
+def mark_message_list(driver):
+    """Remember the open chat and its message list before clicking another chat"""
+    driver.execute_script(
+        MARK_MESSAGE_LIST_SCRIPT,
+        MESSAGE_LIST_SELECTOR,
+        CHAT_HEADER_TITLE_SELECTOR,
+        MESSAGE_SELECTOR,
+    )
+
+
+def wait_for_chat_open(driver, chat_name, peer_id=None, timeout=5):
+    """
+    Wait until the clicked chat has opened: the header shows its name (or its
+    peer id is in the header or the URL) and, unless that chat was already
+    open, the previous chat's messages have been replaced. They stay rendered
+    for a moment after the click, so any message on the page isn't enough.
+    Returns False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(
+                CHAT_OPENED_SCRIPT,
+                MESSAGE_LIST_SELECTOR,
+                CHAT_HEADER_TITLE_SELECTOR,
+                chat_name,
+                peer_id,
+                MESSAGE_SELECTOR,
+            )
+        )
+        return True
+    except TimeoutException:
+        return False
+
 
-        # Scroll element into view
+def click_chat_element(driver, chat_element, chat_name, peer_id=None):
+    """
+    Click on a chat element with error handling
+    Visibility was already checked in VISIBLE_CHATS_SCRIPT; a detached element
+    raises StaleElementReferenceException on click and falls back to the name.
+    Returns True only once the clicked chat has opened.
+    """
+    try:
+        # Scroll element into view (instant, so it can be clicked right away)
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", chat_element
         )
-        time.sleep(0.5)
 
         # Try to click
+        mark_message_list(driver)
         chat_element.click()
-        time.sleep(2)  # Wait for chat to load (Telegram might be slower)
-        return True
+        return wait_for_chat_open(driver, chat_name, peer_id)
 
     except StaleElementReferenceException:
         print(f"  ⚠️ Stale element for {chat_name}, trying name-based click")
-        return click_chat_by_name(driver, chat_name)
+        return click_chat_by_name(driver, chat_name, peer_id)
     except Exception as e:
         print(f"  ❌ Error clicking chat element: {e}")
-        return click_chat_by_name(driver, chat_name)
+        return click_chat_by_name(driver, chat_name, peer_id)
+
+
+def xpath_quote(text):
+    """Quote text as an XPath string literal, even if it contains both quote kinds"""
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    parts = text.split("'")
+    return "concat('" + "', \"'\", '".join(parts) + "')"
 
 
-def click_chat_by_name(driver, chat_name, max_attempts=2):
+def click_chat_by_name(driver, chat_name, peer_id=None, max_attempts=2):
     """
     Fallback method: Click on a chat by finding it by name
     """
     for attempt in range(max_attempts):
         try:
-            # Find chat by name using XPath
-            chat_xpath_selectors = [
-                f"//*[contains(@class, 'user-title') and text()='{chat_name}']//ancestor::*[contains(@class, 'chatlist-chat')]",
-                f"//*[contains(@class, 'dialog-title') and text()='{chat_name}']//ancestor::li",
-                f"//*[contains(@class, 'peer-title') and text()='{chat_name}']//ancestor::*[contains(@class, 'chatlist-chat')]",
-                f"//*[text()='{chat_name}']//ancestor::*[contains(@class, 'chatlist-chat')]",
-            ]
-
-            chat_element = None
-            for xpath in chat_xpath_selectors:
-                try:
-                    chat_element = driver.find_element(By.XPATH, xpath)
-                    if chat_element:
-                        break
-                except:
-                    continue
+            # Find chat by name with one XPath. Title matches under 'user-title'
+            # and 'peer-title' are covered by the generic text() branch.
+            name = xpath_quote(chat_name)
+            chat_xpath = (
+                f"//*[text()={name}]/ancestor::*[contains(@class, 'chatlist-chat')]"
+                f" | //*[contains(@class, 'dialog-title') and text()={name}]/ancestor::li"
+            )
+
+            chat_elements = driver.find_elements(By.XPATH, chat_xpath)
+            chat_element = chat_elements[0] if chat_elements else None
 
             if chat_element:
                 # Scroll the element into view
                 driver.execute_script(
                     "arguments[0].scrollIntoView({block: 'center'});", chat_element
                 )
-                time.sleep(0.5)
 
                 # Click the element
+                mark_message_list(driver)
                 chat_element.click()
-                time.sleep(2)
-                return True
+                return wait_for_chat_open(driver, chat_name, peer_id)
             else:
                 print(
                     f"  ⚠️ Chat not found by name: {chat_name} (attempt {attempt + 1})"
                 )
 
+        except StaleElementReferenceException:
+            # The list re-rendered under us; the next attempt finds it again
+            print(f"  ⚠️ Chat list changed, retrying (attempt {attempt + 1})")
         except Exception as e:
             print(f"  ❌ Error in name-based click (attempt {attempt + 1}): {e}")
             time.sleep(0.5)
@@ -650,8 +956,7 @@ def get_last_messages_from_open_chat(driver, num_messages=10):
     Get the last N messages from an opened chat to search for emails and phones
     """
     try:
-        # Wait for messages to load
-        time.sleep(2)
+        # The click already waited for this chat's messages (wait_for_chat_open)
 
         # Find all message elements - Updated selectors for /a/ version
         message_selectors = [
@@ -669,101 +974,26 @@ def get_last_messages_from_open_chat(driver, num_messages=10):
             "div[dir='auto']",  # Telegram often uses dir='auto' for text
         ]
 
-        messages = []
-        for selector in message_selectors:
-            try:
-                found_messages = driver.find_elements(By.CSS_SELECTOR, selector)
-                if found_messages:
-                    # Filter messages that actually contain text
-                    text_messages = []
-                    for msg in found_messages:
-                        text = msg.text.strip()
-                        if text and len(text) > 2:  # Must have some meaningful content
-                            text_messages.append(msg)
-
-                    if text_messages:
-                        messages = text_messages
-                        print(
-                            f"    Found {len(messages)} messages using selector: {selector}"
-                        )
-                        break
-            except Exception as e:
-                print(f"    Error with selector {selector}: {e}")
-                continue
-
-        if not messages:
+        result = driver.execute_script(
+            LAST_MESSAGES_SCRIPT, message_selectors, num_messages
+        )
+        if not result["messages"]:
             print("    No messages found with any selector")
-            # Try to get any text elements as last resort
-            try:
-                all_text_elements = driver.find_elements(
-                    By.XPATH,
-                    "//*[contains(text(), '@') or contains(text(), '+') or string-length(text()) > 10]",
-                )
-                if all_text_elements:
-                    print(
-                        f"    Found {len(all_text_elements)} text elements as fallback"
-                    )
-                    messages = (
-                        all_text_elements[-num_messages:]
-                        if len(all_text_elements) > num_messages
-                        else all_text_elements
-                    )
-            except:
-                pass
-
-            if not messages:
-                return []
+            return []
 
-        # Get the last N messages (or all if fewer than N)
-        last_messages = (
-            messages[-num_messages:] if len(messages) >= num_messages else messages
+        print(
+            f"    Found {result['count']} messages using selector: {result['selector']}"
         )
 
-        extracted_messages = []
-
-        for i, msg in enumerate(
-            reversed(last_messages)
-        ):  # Process from newest to oldest
-            try:
-                # Extract text
-                body = msg.text.strip()
-
-                # Skip empty messages
-                if not body:
-                    continue
-
-                # Try to determine direction (in Telegram /a/ version)
-                direction = "in"  # Default to incoming
-                try:
-                    # Look for outgoing message indicators
-                    msg_classes = msg.get_attribute("class") or ""
-                    parent_element = msg.find_element(
-                        By.XPATH,
-                        "./ancestor::*[contains(@class, 'Message') or contains(@class, 'message')]",
-                    )
-                    parent_classes = parent_element.get_attribute("class") or ""
-
-                    if (
-                        "own" in parent_classes.lower()
-                        or "out" in parent_classes.lower()
-                        or "outgoing" in parent_classes.lower()
-                    ):
-                        direction = "out"
-                except:
-                    pass
-
-                extracted_messages.append(
-                    {
-                        "body": body,
-                        "direction": direction,
-                        "position": i
-                        + 1,  # 1 = most recent, 2 = second most recent, etc.
-                    }
-                )
-
-            except Exception as e:
-                print(f"    Warning: Error extracting message {i + 1}: {e}")
-                continue
+        # Process from newest to oldest
+        extracted_messages = [
+            {
+                "body": msg["body"],
+                "direction": msg["direction"],
+                "position": i + 1,  # 1 = most recent, 2 = second most recent, etc.
+            }
+            for i, msg in enumerate(reversed(result["messages"]))
+        ]
 
         return extracted_messages
 
@@ -780,34 +1010,51 @@ def find_email_and_phone_in_messages(messages):
     email_result = None
     phone_result = None
 
+    # Lay the unique bodies out as one string so the regex runs once for the
+    # whole chat. "\0" can't be matched by either pattern, so no match spans
+    # two messages; bisect over the start offsets maps a match back.
+    candidates = []
+    starts = []
+    offset = 0
+    seen_bodies = set()  # Forwards and quotes often repeat the same text
     for msg in messages:
-        # Look for email if not found yet
-        if not email_result:
-            email = extract_email_from_text(msg["body"])
-            if email:
-                email_result = {
-                    "email": email,
-                    "found_in_message": msg["body"][:100] + "..."
-                    if len(msg["body"]) > 100
-                    else msg["body"],
-                    "message_position": msg["position"],
-                    "direction": msg["direction"],
-                }
-
-        # Look for phone if not found yet
-        if not phone_result:
-            phone = extract_phone_from_text(msg["body"])
-            if phone:
-                phone_result = {
-                    "phone": phone,
-                    "found_in_message": msg["body"][:100] + "..."
-                    if len(msg["body"]) > 100
-                    else msg["body"],
-                    "message_position": msg["position"],
-                    "direction": msg["direction"],
-                }
-
-        # If both found, break early
+        body = msg["body"]
+        if body in seen_bodies:
+            continue
+        seen_bodies.add(body)
+        candidates.append(msg)
+        starts.append(offset)
+        offset += len(body) + 1
+    joined = "\0".join(msg["body"] for msg in candidates)
+
+    # Cheap C-level checks first: no "@" means no email, so only the phone
+    # pattern is needed, and every phone format has a run of 3+ digits
+    if "@" in joined:
+        pattern = CONTACT_RE
+    elif DIGIT_RUN_RE.search(joined):
+        pattern = PHONE_RE
+    else:
+        return None, None
+
+    for match in pattern.finditer(joined):
+        kind = match.lastgroup or "phone"
+        # Keep only the first email and the first phone
+        if (kind == "email" and email_result) or (kind == "phone" and phone_result):
+            continue
+        msg = candidates[bisect.bisect_right(starts, match.start()) - 1]
+        body = msg["body"]
+        result = {
+            kind: match.group(),
+            "found_in_message": body[:100] + "..." if len(body) > 100 else body,
+            "message_position": msg["position"],
+            "direction": msg["direction"],
+        }
+        if kind == "email":
+            email_result = result
+        else:
+            phone_result = result
+
+        # If both found, stop early
         if email_result and phone_result:
             break
 
@@ -823,11 +1070,16 @@ def process_chats_with_scrolling(driver):
         print("❌ Chat container not found")
         return 0, 0
 
-    # Reset to top
-    driver.execute_script("arguments[0].scrollTop = 0", container)
-    time.sleep(1)
+    # Reset to top, and wait for the top rows to render only if the list moved
+    chat_selector = _last_chat_selector or ".ListItem.Chat"
+    last_chat_text = driver.execute_script(LAST_CHAT_TEXT_SCRIPT, chat_selector)
+    if driver.execute_script(SCROLL_TO_TOP_SCRIPT, container):
+        wait_for_chat_list_change(driver, chat_selector, last_chat_text)
 
-    processed_chats = set()  # Track processed chats by name
+    processed_chats = set()  # Track processed chats by peer id (name as fallback)
+    # UNIQUE(email) keeps only the first row per email, so later chats with
+    # the same email skip the duplicate check and the API call
+    queued_emails = set()
     total_processed = 0
     total_saved = 0
     batch_count = 0
@@ -854,12 +1106,12 @@ def process_chats_with_scrolling(driver):
         current_batch_chats = []
         new_chats_found = 0
 
-        for chat_element in visible_chats:
-            chat_data = extract_chat_data(chat_element)
+        for chat in visible_chats:
+            chat_data = extract_chat_data(chat)
             if chat_data and chat_data["chat_name"] != "Unknown":
-                if chat_data["chat_name"] not in processed_chats:
+                if chat_data["id"] not in processed_chats:
                     current_batch_chats.append(chat_data)
-                    processed_chats.add(chat_data["chat_name"])
+                    processed_chats.add(chat_data["id"])
                     new_chats_found += 1
 
         if new_chats_found == 0:
@@ -872,91 +1124,106 @@ def process_chats_with_scrolling(driver):
 
         print(f"Found {new_chats_found} new chats to process in this batch")
 
-        # Process each chat in current batch
-        batch_saved = 0
-        for i, chat_data in enumerate(current_batch_chats):
-            try:
-                print(
-                    f"\n  [{i + 1}/{len(current_batch_chats)}] Opening {chat_data['chat_name']}..."
-                )
-
-                # Click chat
-                if click_chat_element(
-                    driver, chat_data["element"], chat_data["chat_name"]
-                ):
-                    # Get last 10 messages to search for emails and phones
-                    messages = get_last_messages_from_open_chat(driver, num_messages=10)
-
-                    if messages:
-                        print(f"    Retrieved {len(messages)} messages")
+        # Process each chat in current batch; verification runs in the background
+        # and verified contacts are saved together when the batch ends
+        pending_verifications = []
+        try:
+            for i, chat_data in enumerate(current_batch_chats):
+                try:
+                    print(
+                        f"\n  [{i + 1}/{len(current_batch_chats)}] Opening {chat_data['chat_name']}..."
+                    )
 
-                        # Search for email and phone in all messages
-                        email_result, phone_result = find_email_and_phone_in_messages(
-                            messages
-                        )
+                    # Click chat
+                    if click_chat_element(
+                        driver,
+                        chat_data["element"],
+                        chat_data["chat_name"],
+                        chat_data["id"],
+                    ):
+                        # Get last 10 messages to search for emails and phones
+                        messages = get_last_messages_from_open_chat(driver, num_messages=10)
 
-                        phone = None
-                        email = None
+                        if messages:
+                            # The chat's report goes out in one print (one write)
+                            report = [f"    Retrieved {len(messages)} messages"]
 
-                        # Use found phone or try to extract from chat name as fallback
-                        if phone_result:
-                            phone = clean_phone_number(phone_result["phone"])
-                            print(
-                                f"    Phone: {phone} (found in message #{phone_result['message_position']})"
+                            # Search for email and phone in all messages
+                            email_result, phone_result = find_email_and_phone_in_messages(
+                                messages
                             )
-                        else:
-                            # Try to extract phone from chat name as fallback
-                            phone = clean_phone_number(chat_data["chat_name"])
-                            if phone:
-                                print(f"    Phone: {phone} (from chat name)")
-                            else:
-                                print("    Phone: Not found")
 
-                        if email_result:
-                            email = email_result["email"]
-                            print(
-                                f"    Email: {email} (found in message #{email_result['message_position']})"
-                            )
-                            print(f"    Found in: {email_result['found_in_message']}")
-                        else:
-                            print(
-                                f"    Email: Not found in last {len(messages)} messages"
-                            )
+                            phone = None
+                            email = None
 
-                        # Save to database if both phone and email exist
-                        if phone and email:
-                            if save_contact(phone, email):
-                                print("    💾 Saved to database!")
-                                batch_saved += 1
-                                total_saved += 1
+                            # Use found phone or try to extract from chat name as fallback
+                            if phone_result:
+                                phone = clean_phone_number(phone_result["phone"])
+                                report.append(
+                                    f"    Phone: {phone} (found in message #{phone_result['message_position']})"
+                                )
+                            else:
+                                # Try to extract phone from chat name as fallback
+                                phone = clean_phone_number(chat_data["chat_name"])
+                                if phone:
+                                    report.append(f"    Phone: {phone} (from chat name)")
+                                else:
+                                    report.append("    Phone: Not found")
+
+                            if email_result:
+                                email = email_result["email"]
+                                report += [
+                                    f"    Email: {email} (found in message #{email_result['message_position']})",
+                                    f"    Found in: {email_result['found_in_message']}",
+                                ]
+                            else:
+                                report.append(
+                                    f"    Email: Not found in last {len(messages)} messages"
+                                )
+
+                            # Save to database if both phone and email exist
+                            if email in queued_emails:
+                                report.append("    ⏭️  Email already queued in this scan")
+                            elif phone and email and len(phone) < MIN_PHONE_LENGTH:
+                                # Rejected here so it never reaches the verify pool
+                                report.append("    ⚠️  Phone number too short")
+                            elif phone and email:
+                                queued_emails.add(email)
+                                pending_verifications.append(
+                                    VERIFY_POOL.submit(verify_contact, phone, email)
+                                )
+                                report.append("    🔎 Verification queued")
                             else:
-                                print("    📝 Already exists")
+                                missing = []
+                                if not phone:
+                                    missing.append("phone")
+                                if not email:
+                                    missing.append("email")
+                                report.append(f"    ⚠️  Missing {', '.join(missing)}")
+                            print("\n".join(report))
+
+                            total_processed += 1
+                            if total_processed >= 20:
+                                break
                         else:
-                            missing = []
-                            if not phone:
-                                missing.append("phone")
-                            if not email:
-                                missing.append("email")
-                            print(f"    ⚠️  Missing {', '.join(missing)}")
-
-                        total_processed += 1
-                        if total_processed >= 20:
-                            break
+                            print("    ⚠️  No messages found")
                     else:
-                        print("    ⚠️  No messages found")
-                else:
-                    print("    ❌ Could not open chat")
-
-            except Exception as e:
-                print(f"    ❌ Error processing chat: {e}")
-                continue
+                        print("    ❌ Could not open chat")
 
+                except Exception as e:
+                    print(f"    ❌ Error processing chat: {e}")
+                    continue
+        finally:
+            # Saved even if the batch is cut short, since the API calls
+            # for these contacts have already been made
+            verified_rows = [f.result() for f in pending_verifications]
+            batch_saved = save_contacts_bulk([row for row in verified_rows if row])
+        total_saved += batch_saved
         print(f"  Batch {batch_count} completed: {batch_saved} new contacts saved")
 
         # Scroll down for next batch
         if batch_count < 100:  # Reasonable limit
             scroll_down_and_get_chats(driver, container, scroll_amount=5)
-            time.sleep(0.5)
         else:
             print("Reached maximum batch limit")
             break
@@ -969,27 +1236,38 @@ def process_chats_with_scrolling(driver):
     return total_processed, total_saved
 
 
+def wait_for_chat_updates(driver, timeout=FULL_SCAN_INTERVAL):
+    """
+    Block until the chat list changes, or at most timeout seconds
+    Returns True if a change was seen, False on timeout
+    """
+    try:
+        selector = _last_container_selector or ".chat-list"
+        if not driver.execute_script(WATCH_CHAT_LIST_SCRIPT, selector):
+            time.sleep(timeout)
+            return False
+        WebDriverWait(driver, timeout, poll_frequency=CHAT_POLL_INTERVAL).until(
+            lambda d: d.execute_script(CHAT_LIST_CHANGED_SCRIPT)
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
 def print_database_stats():
     """Print current database statistics"""
-    contacts = get_all_contacts()
+    total_count, verified_count, latest = get_contact_stats(latest=3)
     print("\n📊 Database Stats:")
-    print(f"   Total contacts: {len(contacts)}")
+    print(f"   Total contacts: {total_count}")
 
-    verified_count = sum(
-        1
-        for contact in contacts
-        if contact[3]  # is_verified is at index 3
-    )
-    unverified_count = len(contacts) - verified_count
+    unverified_count = total_count - verified_count
 
     print(f"   Verified contacts: {verified_count}")
     print(f"   Unverified contacts: {unverified_count}")
 
-    if contacts:
+    if latest:
         print("   Latest contacts:")
-        for phone, email, chat_name, is_verified, created_at in contacts[
-            :3
-        ]:  # Show latest 3
+        for phone, email, chat_name, is_verified, created_at in latest:  # Show latest 3
             status = "✓" if is_verified else "✗"
             print(f"     • {phone} - {email} ({chat_name}) [{status}] ({created_at})")
 
@@ -998,7 +1276,8 @@ def main():
     # Initialize database
     init_database()
 
-    driver = make_driver()
+    # --headless runs Chrome without a window, for a profile already logged in
+    driver = make_driver(headless="--headless" in sys.argv)
 
     if not wait_for_login(driver):
         driver.quit()
@@ -1008,7 +1287,7 @@ def main():
         print_database_stats()
 
         while True:
-            print(f"\n--- Starting scan at {datetime.now().strftime('%H:%M:%S')} ---")
+            print(f"\n--- Starting scan at {time.strftime('%H:%M:%S')} ---")
 
             # Process all chats with automatic scrolling
             processed, saved = process_chats_with_scrolling(driver)
@@ -1017,8 +1296,9 @@ def main():
                 print("No chats found or processed")
 
             print_database_stats()
-            print("\nWaiting 30 seconds before next full scan...")
-            time.sleep(30)
+            print(f"\nWaiting up to {FULL_SCAN_INTERVAL} seconds for chat list updates...")
+            if wait_for_chat_updates(driver):
+                print("🔔 Chat list updated")
 
     except KeyboardInterrupt:
         print("\n🛑 Stopped by user")
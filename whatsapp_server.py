@@ -1,9 +1,13 @@
+import atexit
+import bisect
 import json
 import os
 import re
 import sqlite3
+import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import requests
 from selenium import webdriver
@@ -22,13 +26,358 @@ WHATSAPP_WEB = "https://web.whatsapp.com/"
 CHROME_PROFILE_DIR = os.path.abspath("./chrome-profile-wa")
 DATABASE_FILE = "whats_app_telegram_contacts.db"
 BATCH_SIZE = 10  # Process chats in smaller batches
+DEBUG = os.environ.get("SCRAPE_DEBUG") == "1"  # Verbose API and skip logging
+# Set CHROMEDRIVER to a chromedriver binary to skip ChromeDriverManager's
+# update check, which goes over the network on every launch
+_DRIVER_PATH = os.environ.get("CHROMEDRIVER")
+MIN_PHONE_LENGTH = 12  # Digits, country code included; shorter numbers aren't verified
+
+# Media the scraper never reads: avatars (pps.whatsapp.net), attachments and
+# voice notes (mmg.whatsapp.net) and any image or video by extension
+BLOCKED_URL_PATTERNS = [
+    "*pps.whatsapp.net*", "*mmg.whatsapp.net*",
+    "*.jpg", "*.jpeg", "*.png", "*.webp", "*.gif",
+    "*.mp4", "*.webm", "*.ogg", "*.opus", "*.mp3",
+]
+
+# Runs verify_contact in the background while the next chat is opened.
+# Pending work is drained at interpreter exit, before atexit handlers run.
+VERIFY_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Chat list rows, and the name and last-message preview inside a row; one
+# entry per WhatsApp Web layout, tried in order
+CHAT_ROW_SELECTORS = [
+    "div[data-testid='chat-list'] div[role='listitem']",
+    "div[role='grid'] div[role='row']",
+    "div[data-testid='cell-frame-container']",
+    "#pane-side div[tabindex='-1'] > div > div",
+]
+CHAT_NAME_SELECTORS = [
+    "span[dir='auto'][title]",
+    "div[dir='auto'] span[title]",
+    "span[title]",
+    "div[dir='auto']",
+]
+CHAT_PREVIEW_SELECTORS = [
+    "span[dir='ltr']",
+    "span[dir='auto']:not([title])",
+    "div[dir='auto']:not([title])",
+    "span:last-child",
+]
+
+# Text messages in an open chat; present once the conversation has rendered
+MESSAGE_SELECTOR = "div.copyable-text[data-pre-plain-text]"
+MESSAGE_SELECTORS = [
+    "div[data-testid*='msg'] div.copyable-text",
+    MESSAGE_SELECTOR,
+    "span.copyable-text",
+    "div.message-in div.copyable-text, div.message-out div.copyable-text",
+]
+# Classes of the span holding a message's text, in order of preference.
+# WhatsApp renames "_ao3e"-style classes on updates; rotate them here.
+MESSAGE_TEXT_CLASSES = ["selectable-text", "_ao3e"]
+# Visible chat rows with their name and last message preview, for the first
+# row selector (of arguments[1]) that has any, searched for inside the chat
+# container (arguments[0]). Name and preview selectors (arguments[2],
+# arguments[3]) are tried per row, in the page, so a miss costs nothing
+# instead of a WebDriver round-trip; the one that matched a row is tried
+# first on the next. Returns the row selector used and the chats.
+VISIBLE_CHATS_SCRIPT = """
+const [container, rowSelectors, nameSelectors, previewSelectors] = arguments;
+// Match rows within the sidebar subtree rather than the whole document
+const root = container || document.getElementById('pane-side') || document;
+const promote = (list, i) => { if (i > 0) list.unshift(...list.splice(i, 1)); };
+for (const selector of rowSelectors) {
+    const rows = root.querySelectorAll(selector);
+    if (!rows.length) continue;
+    const chats = [];
+    for (const row of rows) {
+        // Same visibility rule as is_displayed() plus a non-zero height
+        if (row.offsetParent === null || row.getBoundingClientRect().height <= 0) continue;
+        let name = '';
+        for (let i = 0; i < nameSelectors.length; i++) {
+            const el = row.querySelector(nameSelectors[i]);
+            if (!el) continue;
+            name = (el.getAttribute('title') || el.innerText || '').trim();
+            if (name) {
+                promote(nameSelectors, i);
+                break;
+            }
+        }
+        let preview = '';
+        search: for (let i = 0; i < previewSelectors.length; i++) {
+            for (const el of row.querySelectorAll(previewSelectors[i])) {
+                const text = (el.innerText || '').trim();
+                // Skip timestamps ("12:30") and other short labels
+                if (text.length > 3 && !text.slice(0, 10).includes(':')) {
+                    preview = text;
+                    promote(previewSelectors, i);
+                    break search;
+                }
+            }
+        }
+        // Stable chat id where WhatsApp exposes one; the name otherwise
+        // (on the row itself or inside it, never a shared ancestor)
+        const idEl = row.matches('[data-id]') ? row : row.querySelector('[data-id]');
+        const id = idEl ? idEl.getAttribute('data-id') : null;
+        // The delivery ticks are only shown when the last message is ours
+        const outgoing = !!row.querySelector("[data-icon*='check']");
+        chats.push({name: name, preview: preview, id: id, outgoing: outgoing});
+    }
+    return {selector: selector, chats: chats};
+}
+return {selector: null, chats: []};
+"""
+# Searches the open chat's last arguments[1] messages, newest first, for the
+# email pattern (arguments[2]) using the first message selector (of
+# arguments[0]) that matches. A message's text is read from its first
+# descendant with one of the MESSAGE_TEXT_CLASSES (arguments[3]). Returns the selector, how many of those
+# messages have text, and the first match with its body, direction and
+# 1-based position (1 = most recent), so Python never reads the bodies.
+FIND_EMAIL_SCRIPT = """
+const [selectors, limit, pattern, textClasses] = arguments;
+const emailRe = new RegExp(pattern);
+// Only the open conversation, not the sidebar
+const root = document.getElementById('main') || document;
+// getElementsByClassName skips the CSS selector engine entirely
+const textOf = (node) => {
+    for (const cls of textClasses) {
+        const el = node.getElementsByClassName(cls)[0];
+        if (el) return el.innerText || '';
+    }
+    return node.innerText || '';
+};
+for (const selector of selectors) {
+    const nodes = root.querySelectorAll(selector);
+    if (!nodes.length) continue;
+    let count = 0;
+    let match = null;
+    Array.from(nodes).slice(-limit).reverse().forEach((node, i) => {
+        const body = textOf(node).trim();
+        if (!body) return;
+        count++;
+        if (match) return;
+        const found = body.match(emailRe);
+        if (found) {
+            match = {
+                email: found[0],
+                body: body,
+                position: i + 1,
+                direction: node.closest('.message-out') ? 'out' : 'in',
+            };
+        }
+    });
+    return {selector: selector, count: count, match: match};
+}
+return {selector: null, count: 0, match: null};
+"""
+# The last N messages of the open chat, newest first, as
+# {body, direction, pre_plain, position}; position counts empty messages too
+LAST_MESSAGES_SCRIPT = """
+const [selectors, limit, textClasses] = arguments;
+const root = document.getElementById('main') || document;
+const textOf = (node) => {
+    for (const cls of textClasses) {
+        const el = node.getElementsByClassName(cls)[0];
+        if (el) return el.innerText || '';
+    }
+    return node.innerText || '';
+};
+for (const selector of selectors) {
+    const nodes = root.querySelectorAll(selector);
+    if (!nodes.length) continue;
+    const messages = [];
+    Array.from(nodes).slice(-limit).reverse().forEach((node, i) => {
+        const body = textOf(node).trim();
+        if (!body) return;
+        messages.push({
+            body: body,
+            // closest() instead of an XPath ancestor lookup per message
+            direction: node.closest('.message-out') ? 'out' : 'in',
+            pre_plain: node.getAttribute('data-pre-plain-text') || '',
+            position: i + 1,  // 1 = most recent
+        });
+    });
+    return {selector: selector, messages: messages};
+}
+return {selector: null, messages: []};
+"""
+# The chat list row with data-id arguments[0] or, failing that, named
+# arguments[1], scrolled into view, or null. Rows are the nearest ancestor
+# matching a selector of arguments[2], tried in order (the one the chat list
+# matched comes first). Names are tried as an exact title, then exact span
+# text, then any text containing the name. Both are compared as strings, so
+# they need no selector escaping.
+FIND_CHAT_SCRIPT = """
+const [chatId, name, rowSelectors] = arguments;
+const root = document.getElementById('pane-side') || document;
+const rowOf = (el) => {
+    if (!el) return null;
+    for (const selector of rowSelectors) {
+        const row = el.closest(selector);
+        if (row) return row;
+    }
+    return null;
+};
+let row = null;
+for (const el of root.querySelectorAll('[data-id]')) {
+    if (el.getAttribute('data-id') === chatId && (row = rowOf(el))) break;
+}
+if (!row) {
+    for (const el of root.querySelectorAll('span[title]')) {
+        if (el.getAttribute('title') === name && (row = rowOf(el))) break;
+    }
+}
+if (!row) {
+    for (const el of root.getElementsByTagName('span')) {
+        if (el.textContent === name && (row = rowOf(el))) break;
+    }
+}
+if (!row) {
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        const node = walker.currentNode;
+        if (node.nodeValue.includes(name) && (row = rowOf(node.parentElement))) break;
+    }
+}
+if (row) row.scrollIntoView({block: 'center'});
+return row;
+"""
+# Scrolls the container (arguments[0]) to the top; returns whether it moved
+SCROLL_TO_TOP_SCRIPT = """
+const el = arguments[0];
+if (!el || el.scrollTop === 0) return false;
+el.scrollTop = 0;
+return true;
+"""
+# Names of the chat rows currently rendered; changes once a scroll has
+# brought new rows into the virtual list
+CHAT_TITLES_SCRIPT = """
+const root = document.getElementById('pane-side') || document;
+return Array.from(root.querySelectorAll('span[title]'), (e) => e.title).join('\\n');
+"""
+# WhatsApp keeps the URL when switching chats, so watch the conversation header
+CHAT_HEADER_SCRIPT = """
+const header = document.querySelector('#main header');
+return !!header && header.textContent.includes(arguments[0]);
+"""
+
+# Between scans, a MutationObserver on the chat list records the names of
+# chats whose rows changed (new message preview, unread badge's aria-label,
+# moved to the top) in window.__newChats. Installing it again keeps the
+# queue; wait_for_chat_updates clears it once a scan is over, since the
+# scan's own scrolling and opened chats change rows too. Returns false if
+# the chat list isn't rendered.
+WATCH_CHAT_LIST_SCRIPT = """
+const pane = document.querySelector('#pane-side');
+if (!pane) return false;
+if (!window.__newChats) window.__newChats = [];
+if (window.__chatObserver && window.__chatObserverPane === pane) return true;
+if (window.__chatObserver) window.__chatObserver.disconnect();
+const collect = (node) => {
+    const row = node.closest("[role='listitem'], [role='row']");
+    if (!row) return;
+    const title = row.querySelector('span[title]');
+    const name = title && title.getAttribute('title');
+    if (name && !window.__newChats.includes(name)) window.__newChats.push(name);
+};
+window.__chatObserver = new MutationObserver((mutations) => {
+    for (const m of mutations) {
+        const target = m.target.nodeType === 1 ? m.target : m.target.parentElement;
+        if (target && target !== pane) collect(target);
+        for (const n of m.addedNodes) if (n.nodeType === 1) collect(n);
+    }
+});
+window.__chatObserver.observe(pane, {
+    childList: true,
+    characterData: true,
+    subtree: true,
+    attributes: true,
+    attributeFilter: ['aria-label'],
+});
+window.__chatObserverPane = pane;
+return true;
+"""
+# Hands over and clears the recorded chat names; null once the observed
+# chat list has been replaced and the observer needs installing again.
+# An expression for cdp_eval, which skips WebDriver's script wrapping.
+DRAIN_NEW_CHATS_EXPRESSION = """(() => {
+    const pane = window.__chatObserverPane;
+    if (!pane || !pane.isConnected) return null;
+    const names = window.__newChats;
+    window.__newChats = [];
+    return names;
+})()"""
+# Drops the changes recorded during a scan (its own scrolling and reading)
+CLEAR_NEW_CHATS_EXPRESSION = "window.__newChats = []; true"
+CHAT_POLL_INTERVAL = 0.5  # seconds between checks of window.__newChats
+FULL_SCAN_INTERVAL = 30  # seconds; the longest wait before a full rescan
+
+# Compiled once at import instead of going through re's cache on every call.
+# The lookbehind only lets a match start at the beginning of a run of
+# local-part characters, and domain labels can't contain ".", so the
+# pattern never backtracks quadratically. Also used as a JS RegExp.
+EMAIL_RE = re.compile(
+    r"(?<![a-zA-Z0-9._%+-])[a-zA-Z0-9._%+-]+"
+    r"@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*\.[a-zA-Z]{2,}",
+    re.ASCII,
+)
+NON_DIGIT_RE = re.compile(r"[^\d]")
+# Deletes every ASCII character except 0-9 in one C-level pass
+PHONE_DELETE_TABLE = str.maketrans(
+    "", "", "".join(chr(i) for i in range(128) if not chr(i).isdigit())
+)
+
+# Message selector that last matched; tried first since the others fail on every chat
+_last_message_selector = None
+# Same for the chat list row selectors
+_last_chat_selector = None
+# Sidebar element found by get_chat_container; reused until it goes stale
+_chat_container = None
+
+_CONN = None  # Shared connection, opened lazily by get_connection()
+_DB_LOCK = threading.Lock()  # Serializes use of the shared connection across threads
+_SEEN_PHONES = set()  # Phones already in the database, loaded by init_database
+# Chat id -> last message preview of chats read without finding an email,
+# loaded by init_database so a restart skips them until their preview changes.
+# Chats whose preview couldn't be read (NO_PREVIEW) are never recorded.
+_SCANNED_CHATS = {}
+# Account this process scans (set by run_account); scanned_chats rows are
+# kept per account, since a chat id means a different chat in each one
+_ACCOUNT = ""
+NO_PREVIEW = "No preview available"
+
+
+def connect_database():
+    """Open a database connection tuned for the WAL journal set up in init_database"""
+    # Account processes share the file; wait on each other's write locks
+    # rather than failing with "database is locked" after the default 5s
+    conn = sqlite3.connect(DATABASE_FILE, timeout=30, check_same_thread=False)
+    # WAL only needs an fsync at checkpoints, so NORMAL is still crash-safe
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
+def get_connection():
+    """Return the process-wide database connection, opening it on first use"""
+    global _CONN
+    if _CONN is None:
+        _CONN = connect_database()
+        atexit.register(_CONN.close)
+    return _CONN
 
 
 def init_database():
     """Initialize SQLite database and create table if not exists"""
-    conn = sqlite3.connect(DATABASE_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
 
+    # WAL is persistent on the file, so this only needs to run once
+    cursor.execute("PRAGMA journal_mode=WAL")
+
     # First, create the table with the new structure
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS contacts (
@@ -52,42 +401,72 @@ def init_database():
         )
         print("✓ Added is_verified column to existing table")
 
+    # Same index telegram_server.py creates on this shared database file
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_contacts_email_verified "
+        "ON contacts(email, is_verified)"
+    )
+    # scanned_chats is only a cache of chats to skip, so a table from before
+    # rows were kept per account is dropped rather than migrated
+    cursor.execute("PRAGMA table_info(scanned_chats)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if columns and "account" not in columns:
+        cursor.execute("DROP TABLE scanned_chats")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scanned_chats (
+            account TEXT NOT NULL DEFAULT '',
+            chat_id TEXT NOT NULL,
+            preview TEXT NOT NULL,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (account, chat_id)
+        )
+    """)
+    cursor.execute("ANALYZE")
+
     conn.commit()
-    conn.close()
-    print(f"✓ Database initialized: {DATABASE_FILE}")
 
+    _SEEN_PHONES.update(phone for (phone,) in cursor.execute("SELECT phone FROM contacts"))
+    _SCANNED_CHATS.update(
+        cursor.execute(
+            "SELECT chat_id, preview FROM scanned_chats WHERE account = ?", (_ACCOUNT,)
+        )
+    )
+    print(f"✓ Database initialized: {DATABASE_FILE} ({len(_SEEN_PHONES)} known phones)")
 
-def save_contact(phone, email):
+
+def verify_contact(phone, email):
     """
-    Save phone and email to database with is_verified set to False
-    Only saves if both phone and email are provided
-    Returns True if saved, False if already exists or invalid data
+    Verify phone and email with the API without writing to the database
+    Only verifies if both phone and email are provided
+    Returns a (phone, email, is_replaced) row for save_contacts_bulk,
+    or None if already saved, invalid or not verified
     """
     if not phone or not email:
         print("❌ Both phone and email are required")
-        return False
-    if len(phone) < 12:
+        return None
+    if len(phone) < MIN_PHONE_LENGTH:
         print("Phone number is not valid")
-        return False
+        return None
 
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
-        # Check if this combination already exists
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM contacts 
-            WHERE email = ?
-            AND is_verified = 1
-        """,
-            (email,),
-        )
+        cursor = get_connection().cursor()
+
+        # Check if this combination already exists (skips the verification API call)
+        with _DB_LOCK:
+            cursor.execute(
+                """
+                SELECT 1 FROM contacts 
+                WHERE email = ?
+                AND is_verified = 1
+                LIMIT 1
+            """,
+                (email,),
+            )
+            exists = cursor.fetchone() is not None
 
-        if cursor.fetchone()[0] > 0:
+        if exists:
             print(f"⚠️  Contact already exists: {phone} - {email}")
-            conn.close()
-            return False
+            return None
         url = (
             "http://api.topofstacksoftware.com/quran-hadith/api/verify-by-whatsapp-text"
         )
@@ -105,42 +484,22 @@ def save_contact(phone, email):
             # Print response status code
             print(f"Status Code: {response.status_code}")
 
-            # Print response headers
-            print(f"Response Headers: {dict(response.headers)}")
+            if DEBUG:
+                print(f"Response Headers: {dict(response.headers)}")
 
             # Try to parse JSON response
             try:
                 response_data = response.json()
-                print(f"Response JSON: {json.dumps(response_data, indent=2)}")
+                if DEBUG:
+                    print(f"Response JSON: {json.dumps(response_data, indent=2)}")
             except json.JSONDecodeError:
                 print(f"Response Text: {response.text}")
 
             # Check if request was successful
             if response.status_code == 200:
                 print("✅ Request successful!")
-                is_replaced = response_data.get("is_replaced", None)
-                if is_replaced == "true":
-                    cursor.execute(
-                        """
-                        UPDATE contacts 
-                        SET is_verified = ? 
-                        WHERE phone = ?
-                        """,
-                        (False, phone),
-                    )
-                    conn.commit()
-                    print("✅ Email replaced")
-                cursor.execute(
-                    """
-                    INSERT INTO contacts (phone, email, is_verified) 
-                    VALUES (?, ?, ?)
-                """,
-                    (phone, email, True),
-                )
-                conn.commit()
-                print(f"✅ New contact saved: {phone} - {email} (verified: True)")
-                conn.close()
-                return True
+                is_replaced = response_data.get("is_replaced", None) == "true"
+                return (phone, email, is_replaced)
             else:
                 print(f"❌ Request failed with status code: {response.status_code}")
 
@@ -149,58 +508,147 @@ def save_contact(phone, email):
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
 
-    except sqlite3.IntegrityError:
-        print(f"⚠️  Contact already exists: {phone} - {email}")
-        return False
     except Exception as e:
-        print(f"❌ Error saving contact: {e}")
-        return False
+        print(f"❌ Error verifying contact: {e}")
+    return None
+
+
+def save_contacts_bulk(rows, scanned_chats=()):
+    """
+    Save verified (phone, email, is_replaced) rows in a single transaction
+    Contacts whose email is already stored are skipped
+    (chat_id, preview) pairs in scanned_chats are recorded in the same transaction
+    Returns the number of new contacts saved
+    """
+    if not rows and not scanned_chats:
+        return 0
+
+    conn = get_connection()
+    try:
+        with _DB_LOCK:
+            try:
+                # Row by row, in order, so a replaced email only clears the
+                # contacts saved before it, as separate saves would
+                saved = 0
+                for phone, email, is_replaced in rows:
+                    if is_replaced:
+                        # The phone's previous contacts are no longer verified
+                        conn.execute(
+                            """
+                            UPDATE contacts 
+                            SET is_verified = 0 
+                            WHERE phone = ?
+                            """,
+                            (phone,),
+                        )
+                    # UNIQUE(email) decides duplicates; no IntegrityError round trip
+                    cursor = conn.execute(
+                        """
+                        INSERT OR IGNORE INTO contacts (phone, email, is_verified) 
+                        VALUES (?, ?, 1)
+                    """,
+                        (phone, email),
+                    )
+                    saved += cursor.rowcount
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO scanned_chats (account, chat_id, preview, last_seen)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                    [(_ACCOUNT, chat_id, preview) for chat_id, preview in scanned_chats],
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            _SEEN_PHONES.update(phone for phone, _, _ in rows)
+            _SCANNED_CHATS.update(scanned_chats)
+
+        if rows:
+            print(f"✅ Saved {saved} of {len(rows)} verified contacts")
+        return saved
+    except Exception as e:
+        print(f"❌ Error saving contacts: {e}")
+        return 0
+
+
+def save_contact(phone, email):
+    """
+    Verify a single contact and save it right away
+    Returns True if saved, False if already exists or invalid data
+    """
+    row = verify_contact(phone, email)
+    return bool(row) and save_contacts_bulk([row]) > 0
 
 
 def get_all_contacts():
     """Get all contacts from database"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
 
-        cursor.execute("""
-            SELECT phone, email, is_verified, created_at FROM contacts 
-            ORDER BY created_at DESC
-        """)
+        with _DB_LOCK:
+            cursor.execute("""
+                SELECT phone, email, is_verified, created_at FROM contacts 
+                ORDER BY created_at DESC
+            """)
 
-        contacts = cursor.fetchall()
-        conn.close()
-
-        return contacts
+            return cursor.fetchall()
     except Exception as e:
         print(f"❌ Error retrieving contacts: {e}")
         return []
 
 
+def get_contact_stats(latest=3):
+    """
+    Get (total, verified, latest_contacts) without reading the whole table
+    latest_contacts holds the newest rows as (phone, email, is_verified, created_at)
+    """
+    try:
+        cursor = get_connection().cursor()
+
+        with _DB_LOCK:
+            cursor.execute("SELECT COUNT(*), SUM(is_verified = 1) FROM contacts")
+            total, verified = cursor.fetchone()
+            # id follows insertion order and is the primary key, so no sort is needed
+            cursor.execute(
+                """
+                SELECT phone, email, is_verified, created_at FROM contacts 
+                ORDER BY id DESC
+                LIMIT ?
+            """,
+                (latest,),
+            )
+            return total, verified or 0, cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Error retrieving contact stats: {e}")
+        return 0, 0, []
+
+
 def update_verification_status(email, is_verified=True):
     """
     Update the verification status of a contact by email
     """
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            UPDATE contacts 
-            SET is_verified = ? 
-            WHERE email = ?
-        """,
-            (is_verified, email),
-        )
+        with _DB_LOCK:
+            cursor.execute(
+                """
+                UPDATE contacts 
+                SET is_verified = ? 
+                WHERE email = ?
+            """,
+                (is_verified, email),
+            )
+            # Commit even when nothing matched so the shared connection
+            # isn't left inside an open transaction
+            conn.commit()
 
         if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
             print(f"✅ Updated verification status for {email}: {is_verified}")
             return True
         else:
-            conn.close()
             print(f"⚠️  No contact found with email: {email}")
             return False
 
@@ -211,37 +659,81 @@ def update_verification_status(email, is_verified=True):
 
 def extract_email_from_text(text):
     """Extract email from text using regex"""
-    pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-    match = re.search(pattern, text)
+    match = EMAIL_RE.search(text)
     return match.group() if match else None
 
 
 def clean_phone_number(phone_text):
     """Clean and format phone number by removing +, spaces, and hyphens"""
-    # Remove common prefixes and clean the phone number
-    phone = phone_text.strip()
-    # Remove WhatsApp Web formatting
-    phone = phone.replace("~", "")
-    # Remove plus sign, spaces, and hyphens, keep only digits
-    phone = re.sub(r"[^\d]", "", phone)
-    return phone.strip() if phone else None
-
-
-def make_driver():
-    os.makedirs(CHROME_PROFILE_DIR, exist_ok=True)
+    # Remove plus sign, spaces, hyphens and WhatsApp's "~", keep only digits
+    phone = phone_text.translate(PHONE_DELETE_TABLE)
+    # Direction marks, non-breaking spaces etc. aren't in the ASCII table
+    if not phone.isascii():
+        phone = NON_DIGIT_RE.sub("", phone)
+    return phone or None
+
+
+def get_driver_path():
+    global _DRIVER_PATH
+    if _DRIVER_PATH is None:
+        _DRIVER_PATH = ChromeDriverManager().install()
+    return _DRIVER_PATH
+
+
+def get_profile_dir(account=None):
+    """Chrome profile for an account; each logged-in WhatsApp session needs its own"""
+    if account is None:
+        return CHROME_PROFILE_DIR
+    return f"{CHROME_PROFILE_DIR}-{account}"
+
+
+def make_driver(profile_dir=CHROME_PROFILE_DIR, headless=False):
+    # Chrome can't share a cache between browser processes, so each profile
+    # (one per --accounts process) gets its own, kept between runs
+    cache_dir = f"{profile_dir}-cache"
+    os.makedirs(profile_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
     options = webdriver.ChromeOptions()
-    options.add_argument(f"--user-data-dir={CHROME_PROFILE_DIR}")
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument(f"--disk-cache-dir={cache_dir}")
+    options.add_argument("--disk-cache-size=104857600")
     options.add_argument("--profile-directory=Default")
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
-
-    service = Service(ChromeDriverManager().install())
+    # Set at launch instead of a set_window_size call afterwards
+    options.add_argument("--window-size=1200,900")
+    # Avatars, thumbnails and media are never read; don't fetch or decode them
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--autoplay-policy=user-gesture-required")
+    options.add_argument("--mute-audio")
+    # Chrome keeps only the last --disable-features, so they share one flag
+    options.add_argument("--disable-features=Translate,MediaRouter,OptimizationHints")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    if headless:
+        # Only once the profile is logged in: the QR code needs a visible window
+        options.add_argument("--headless=new")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    # Also block images at the content-settings level, not just in Blink
+    options.add_experimental_option(
+        "prefs", {"profile.managed_default_content_settings.images": 2}
+    )
+    # Return from get() on DOMContentLoaded; wait_for_login waits for the chat list
+    options.page_load_strategy = "eager"
+
+    service = Service(get_driver_path())
     driver = webdriver.Chrome(service=service, options=options)
-    driver.set_window_size(1200, 900)
+    block_media(driver)
     return driver
 
 
+def block_media(driver):
+    """Block BLOCKED_URL_PATTERNS in the current tab (CDP settings are per tab)"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+
 def wait_for_login(driver, timeout=180):
     print("Loading WhatsApp Web...")
     driver.get(WHATSAPP_WEB)
@@ -269,8 +761,12 @@ def wait_for_login(driver, timeout=180):
         return False
 
 
-def get_chat_container(driver):
-    """Find and return the chat container element"""
+def get_chat_container(driver, refresh=False):
+    """Find and return the chat container element, cached after the first lookup"""
+    global _chat_container
+    if _chat_container is not None and not refresh:
+        return _chat_container
+
     chat_container_selectors = [
         "div[data-testid='chat-list']",
         "div[data-testid='side']",
@@ -278,313 +774,305 @@ def get_chat_container(driver):
         "div[role='grid']",
     ]
 
-    for selector in chat_container_selectors:
-        try:
-            container = driver.find_element(By.CSS_SELECTOR, selector)
-            if container:
-                return container
-        except:
-            continue
-
-    return None
-
+    # Probe the whole ladder in one CDP call that returns only the winning
+    # selector, then fetch a WebElement for that one selector
+    selector = cdp_eval(
+        driver,
+        f"{json.dumps(chat_container_selectors)}"
+        ".find((s) => document.querySelector(s)) || null",
+    )
+    if not selector:
+        return None
 
-def get_current_visible_chats(driver):
-    """Get currently visible chat elements in the viewport"""
-    chat_selectors = [
-        "div[data-testid='chat-list'] div[role='listitem']",
-        "div[role='grid'] div[role='row']",
-        "div[data-testid='cell-frame-container']",
-        "#pane-side div[tabindex='-1'] > div > div",
-    ]
+    # find_elements returns [] on a miss instead of raising NoSuchElementException
+    containers = driver.find_elements(By.CSS_SELECTOR, selector)
+    _chat_container = containers[0] if containers else None
+    return _chat_container
 
-    for selector in chat_selectors:
-        try:
-            chat_items = driver.find_elements(By.CSS_SELECTOR, selector)
-            if chat_items:
-                # Filter out only visible elements
-                visible_chats = []
-                for chat in chat_items:
-                    try:
-                        if chat.is_displayed() and chat.size["height"] > 0:
-                            visible_chats.append(chat)
-                    except StaleElementReferenceException:
-                        continue
-
-                return visible_chats
-        except:
-            continue
 
-    return []
+def run_on_chat_container(driver, script, *args):
+    """
+    Run a script with the cached chat container as arguments[0]
+    The container is located again if WhatsApp has re-rendered it
+    """
+    try:
+        return driver.execute_script(script, get_chat_container(driver), *args)
+    except StaleElementReferenceException:
+        container = get_chat_container(driver, refresh=True)
+        return driver.execute_script(script, container, *args)
 
 
-def extract_chat_data(chat_element):
-    """Extract data from a single chat element"""
+def get_current_visible_chats(driver):
+    """
+    Get currently visible chats in the viewport
+    Returns dicts with each chat's id, name and preview, read in one script call
+    """
+    global _last_chat_selector
     try:
-        # Get chat name
-        chat_name = "Unknown"
-        name_selectors = [
-            "span[dir='auto'][title]",
-            "div[dir='auto'] span[title]",
-            "span[title]",
-            "div[dir='auto']",
-        ]
-
-        for name_sel in name_selectors:
-            try:
-                name_el = chat_element.find_element(By.CSS_SELECTOR, name_sel)
-                name = name_el.get_attribute("title") or name_el.text
-                if name and name.strip():
-                    chat_name = name.strip()
-                    break
-            except:
-                continue
+        result = run_on_chat_container(
+            driver,
+            VISIBLE_CHATS_SCRIPT,
+            prefer_selector(CHAT_ROW_SELECTORS, _last_chat_selector),
+            CHAT_NAME_SELECTORS,
+            CHAT_PREVIEW_SELECTORS,
+        )
+    except Exception as e:
+        print(f"Error reading chat list: {e}")
+        return []
 
-        # Get last message preview
-        last_message = ""
-        message_selectors = [
-            "span[dir='ltr']",
-            "span[dir='auto']:not([title])",
-            "div[dir='auto']:not([title])",
-            "span:last-child",
-        ]
+    if result["selector"]:
+        _last_chat_selector = result["selector"]
+    return result["chats"]
 
-        for msg_sel in message_selectors:
-            try:
-                msg_elements = chat_element.find_elements(By.CSS_SELECTOR, msg_sel)
-                for msg_el in msg_elements:
-                    text = msg_el.text.strip()
-                    if text and len(text) > 3 and ":" not in text[:10]:
-                        last_message = text
-                        break
-                if last_message:
-                    break
-            except:
-                continue
 
-        return {
-            "chat_name": chat_name,
-            "last_message": last_message or "No preview available",
-            "element": chat_element,  # Keep reference for clicking
-        }
-
-    except StaleElementReferenceException:
-        return None
-    except Exception as e:
-        print(f"Error extracting chat data: {e}")
-        return None
+def extract_chat_data(chat):
+    """Extract data from a single chat returned by get_current_visible_chats"""
+    chat_name = chat["name"] or "Unknown"
+    return {
+        "chat_name": chat_name,
+        "last_message": chat["preview"] or NO_PREVIEW,
+        "id": chat.get("id") or chat_name,
+        "preview_direction": "out" if chat.get("outgoing") else "in",
+    }
 
 
-def scroll_down_and_get_chats(driver, container, scroll_amount=3):
-    """Scroll down a bit and get newly visible chats"""
+def scroll_down_and_get_chats(driver, scroll_amount=3):
+    """
+    Scroll down a bit so newly visible chats get rendered
+    The caller reads them with its next get_current_visible_chats call
+    """
     try:
+        titles = driver.execute_script(CHAT_TITLES_SCRIPT)
+
         # Scroll down gradually
         for _ in range(scroll_amount):
-            driver.execute_script(
-                "arguments[0].scrollTop += arguments[0].clientHeight * 0.3", container
+            run_on_chat_container(
+                driver, "arguments[0].scrollTop += arguments[0].clientHeight * 0.3"
             )
-            time.sleep(0.2)
-
-        # Wait for content to load
-        time.sleep(0.5)
+            time.sleep(0.05)  # Debounce so the virtual list renders between steps
 
-        # Get currently visible chats
-        return get_current_visible_chats(driver)
+        # Wait for content to load: the rendered rows change
+        wait_for_chat_list_change(driver, titles)
 
     except Exception as e:
         print(f"Error scrolling: {e}")
-        return []
 
 
-def click_chat_element(driver, chat_element, chat_name):
-    """Click on a chat element with error handling"""
+def wait_for_chat_list_change(driver, titles, timeout=1.5):
+    """Wait until the rendered chat rows differ from titles (a CHAT_TITLES_SCRIPT result)"""
     try:
-        # Check if element is still valid
-        if not chat_element.is_displayed():
-            return False
-
-        # Scroll element into view
-        driver.execute_script(
-            "arguments[0].scrollIntoView({block: 'center'});", chat_element
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(CHAT_TITLES_SCRIPT) != titles
         )
-        time.sleep(0.5)
+    except TimeoutException:
+        pass  # Nothing new rendered, e.g. already at the bottom
 
-        # Try to click
-        chat_element.click()
-        time.sleep(1.5)  # Wait for chat to load
-        return True
 
-    except StaleElementReferenceException:
-        print(f"  ⚠️ Stale element for {chat_name}, trying name-based click")
-        return click_chat_by_name(driver, chat_name)
-    except Exception as e:
-        print(f"  ❌ Error clicking chat element: {e}")
-        return click_chat_by_name(driver, chat_name)
+def wait_for_chat_open(driver, chat_name, timeout=3):
+    """
+    Wait until the conversation header shows the clicked chat's name.
+    Returns False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(CHAT_HEADER_SCRIPT, chat_name)
+        )
+        return True
+    except TimeoutException:
+        return False
 
 
-def click_chat_by_name(driver, chat_name, max_attempts=2):
+def click_chat(driver, chat_id, chat_name, max_attempts=2):
     """
-    Fallback method: Click on a chat by finding it by name
+    Click on a chat, found by its id (or name) right before the click
+    No WebElement is kept between the chat list snapshot and the click,
+    so new messages re-rendering the list can't leave a stale handle behind
     """
     for attempt in range(max_attempts):
         try:
-            # Find chat by name using XPath
-            chat_xpath_selectors = [
-                f"//span[@title='{chat_name}']//ancestor::div[@role='listitem']",
-                f"//span[text()='{chat_name}']//ancestor::div[@role='listitem']",
-                f"//*[contains(text(), '{chat_name}')]//ancestor::div[@role='listitem']",
-            ]
-
-            chat_element = None
-            for xpath in chat_xpath_selectors:
-                try:
-                    chat_element = driver.find_element(By.XPATH, xpath)
-                    if chat_element:
-                        break
-                except:
-                    continue
+            # Find the chat's row and scroll it into view in one call
+            chat_element = driver.execute_script(
+                FIND_CHAT_SCRIPT,
+                chat_id,
+                chat_name,
+                prefer_selector(CHAT_ROW_SELECTORS, _last_chat_selector),
+            )
 
             if chat_element:
-                # Scroll the element into view
-                driver.execute_script(
-                    "arguments[0].scrollIntoView({block: 'center'});", chat_element
-                )
-                time.sleep(0.5)
-
-                # Click the element
+                # Click the element; the header must show the chat, or the
+                # previous chat's messages would be read under this name
                 chat_element.click()
-                time.sleep(1.5)
-                return True
+                if wait_for_chat_open(driver, chat_name):
+                    return True
+                print(f"  ⚠️ {chat_name} didn't open (attempt {attempt + 1})")
             else:
-                print(
-                    f"  ⚠️ Chat not found by name: {chat_name} (attempt {attempt + 1})"
-                )
+                print(f"  ⚠️ Chat not found: {chat_name} (attempt {attempt + 1})")
 
+        except StaleElementReferenceException:
+            # The list re-rendered between lookup and click; look it up again
+            print(f"  ⚠️ Chat list changed, retrying (attempt {attempt + 1})")
         except Exception as e:
-            print(f"  ❌ Error in name-based click (attempt {attempt + 1}): {e}")
-            time.sleep(0.5)
+            print(f"  ❌ Error clicking chat (attempt {attempt + 1}): {e}")
 
     return False
 
 
-def get_last_messages_from_open_chat(driver, num_messages=10):
-    """
-    Get the last N messages from an opened chat to search for emails
-    """
+def wait_for_messages(driver, timeout=3):
+    """Wait for the open chat's messages to load; chats without text messages time out"""
     try:
-        # Wait for messages to load
-        time.sleep(1.5)
-
-        # Find all message elements
-        message_selectors = [
-            "div[data-testid*='msg'] div.copyable-text",
-            "div.copyable-text[data-pre-plain-text]",
-            "span.copyable-text",
-            "div.message-in div.copyable-text, div.message-out div.copyable-text",
-        ]
-
-        messages = []
-        for selector in message_selectors:
-            messages = driver.find_elements(By.CSS_SELECTOR, selector)
-            if messages:
-                break
-
-        if not messages:
-            return []
-
-        # Get the last N messages (or all if fewer than N)
-        last_messages = (
-            messages[-num_messages:] if len(messages) >= num_messages else messages
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, MESSAGE_SELECTOR))
         )
+    except TimeoutException:
+        pass
 
-        extracted_messages = []
 
-        for i, msg in enumerate(
-            reversed(last_messages)
-        ):  # Process from newest to oldest
-            try:
-                # Extract text
-                body = ""
-                try:
-                    text_el = msg.find_element(
-                        By.CSS_SELECTOR, "span.selectable-text, span._ao3e"
-                    )
-                    body = text_el.text.strip()
-                except:
-                    body = msg.text.strip()
+def prefer_selector(selectors, last):
+    """A copy of selectors with the one that last matched moved to the front"""
+    if last not in selectors:
+        return list(selectors)
+    return [last] + [selector for selector in selectors if selector != last]
 
-                # Skip empty messages
-                if not body:
-                    continue
-
-                # Extract metadata
-                pre_plain = msg.get_attribute("data-pre-plain-text") or ""
 
-                # Determine if it's incoming or outgoing
-                direction = "in"
-                try:
-                    parent = msg.find_element(
-                        By.XPATH, "./ancestor::div[contains(@class, 'message-')]"
-                    )
-                    if "message-out" in parent.get_attribute("class"):
-                        direction = "out"
-                except:
-                    pass
-
-                extracted_messages.append(
-                    {
-                        "body": body,
-                        "direction": direction,
-                        "pre_plain": pre_plain,
-                        "position": i
-                        + 1,  # 1 = most recent, 2 = second most recent, etc.
-                    }
-                )
+def get_message_selectors():
+    """Message selectors to try, the one that last matched first"""
+    return prefer_selector(MESSAGE_SELECTORS, _last_message_selector)
 
-            except Exception as e:
-                print(f"    Warning: Error extracting message {i + 1}: {e}")
-                continue
 
-        return extracted_messages
+def get_last_messages_from_open_chat(driver, num_messages=10):
+    """
+    Get the last N messages from an opened chat to search for emails
+    """
+    global _last_message_selector
+    try:
+        wait_for_messages(driver)
+
+        # Body, metadata and direction of every message in one round-trip
+        result = driver.execute_script(
+            LAST_MESSAGES_SCRIPT,
+            get_message_selectors(),
+            num_messages,
+            MESSAGE_TEXT_CLASSES,
+        )
+        if result["selector"]:
+            _last_message_selector = result["selector"]
+        return result["messages"]
 
     except Exception as e:
         print(f"    Error getting messages from open chat: {e}")
         return []
 
 
+def find_email_in_open_chat(driver, num_messages=10):
+    """
+    Search the open chat's last N messages for an email in one script call
+    Returns (email_result, message_count); email_result has the same shape
+    as find_email_in_messages' and is None if no email was found
+    """
+    wait_for_messages(driver)
+
+    global _last_message_selector
+    try:
+        result = driver.execute_script(
+            FIND_EMAIL_SCRIPT,
+            get_message_selectors(),
+            num_messages,
+            EMAIL_RE.pattern,
+            MESSAGE_TEXT_CLASSES,
+        )
+    except Exception as e:
+        # Fall back to reading the messages one by one
+        print(f"    Error scanning messages in the page: {e}")
+        messages = get_last_messages_from_open_chat(driver, num_messages)
+        return find_email_in_messages(messages), len(messages)
+
+    if result["selector"]:
+        _last_message_selector = result["selector"]
+    match = result["match"]
+    if not match:
+        return None, result["count"]
+
+    body = match["body"]
+    return {
+        "email": match["email"],
+        "found_in_message": body[:100] + "..." if len(body) > 100 else body,
+        "message_position": match["position"],
+        "direction": match["direction"],
+    }, result["count"]
+
+
+def find_email_in_preview(chat_data):
+    """
+    Search a chat's sidebar preview (its last message) for an email
+    Returns a result shaped like find_email_in_messages', or None
+    """
+    preview = chat_data["last_message"]
+    match = EMAIL_RE.search(preview) if "@" in preview else None
+    if not match:
+        return None
+    return {
+        "email": match.group(),
+        "found_in_message": preview[:100] + "..." if len(preview) > 100 else preview,
+        "message_position": 1,
+        "direction": chat_data["preview_direction"],
+    }
+
+
 def find_email_in_messages(messages):
     """
     Search for email addresses in a list of messages
     Returns the first email found and the message it was found in
     """
+    # Search all bodies as one string so the regex runs once per chat.
+    # "\0" can't be part of an email, so no match spans two messages;
+    # bisect over the start offsets maps the match back to its message.
+    starts = []
+    offset = 0
     for msg in messages:
-        email = extract_email_from_text(msg["body"])
-        if email:
-            return {
-                "email": email,
-                "found_in_message": msg["body"][:100] + "..."
-                if len(msg["body"]) > 100
-                else msg["body"],
-                "message_position": msg["position"],
-                "direction": msg["direction"],
-            }
-    return None
+        starts.append(offset)
+        offset += len(msg["body"]) + 1
+    joined = "\0".join(msg["body"] for msg in messages)
 
+    # No "@" anywhere means no email; skip the regex entirely
+    if "@" not in joined:
+        return None
+    match = EMAIL_RE.search(joined)
+    if not match:
+        return None
 
-def process_chats_with_scrolling(driver):
+    msg = messages[bisect.bisect_right(starts, match.start()) - 1]
+    body = msg["body"]
+    return {
+        "email": match.group(),
+        "found_in_message": body[:100] + "..." if len(body) > 100 else body,
+        "message_position": msg["position"],
+        "direction": msg["direction"],
+    }
+
+
+def process_chats_with_scrolling(driver, chat_names=None, preview_only=False):
     """
     Main function to process chats by scrolling through the entire list
+    If chat_names is given, only those chats are considered (known phones and
+    unchanged chats are still skipped) and the scan stops once all of them
+    have been seen. With preview_only, chats are never
+    opened: only emails in the chat list previews are found.
     """
-    container = get_chat_container(driver)
-    if not container:
+    if not get_chat_container(driver):
         print("❌ Chat container not found")
         return 0, 0
 
-    # Reset to top
-    driver.execute_script("arguments[0].scrollTop = 0", container)
-    time.sleep(1)
-
-    processed_chats = set()  # Track processed chats by name
+    # Reset to top, and wait for the top rows to render only if the list moved
+    titles = driver.execute_script(CHAT_TITLES_SCRIPT)
+    if run_on_chat_container(driver, SCROLL_TO_TOP_SCRIPT):
+        wait_for_chat_list_change(driver, titles)
+
+    processed_chats = set()  # Track processed chats by id (name as fallback)
+    # UNIQUE(email) keeps only the first row per email, so later chats with
+    # the same email skip the duplicate check and the API call
+    queued_emails = set()
+    # Changed chats not reached yet; the scan ends once all have been seen
+    remaining_names = set(chat_names) if chat_names is not None else None
     total_processed = 0
     total_saved = 0
     batch_count = 0
@@ -595,6 +1083,8 @@ def process_chats_with_scrolling(driver):
     while no_new_chats_count < 3:  # Stop after 3 attempts with no new chats
         if total_processed >= 20:
             break
+        if remaining_names is not None and not remaining_names:
+            break
         batch_count += 1
         print(f"\n--- Batch {batch_count} ---")
 
@@ -603,7 +1093,7 @@ def process_chats_with_scrolling(driver):
 
         if not visible_chats:
             print("No visible chats found, scrolling...")
-            scroll_down_and_get_chats(driver, container)
+            scroll_down_and_get_chats(driver)
             no_new_chats_count += 1
             continue
 
@@ -611,91 +1101,147 @@ def process_chats_with_scrolling(driver):
         current_batch_chats = []
         new_chats_found = 0
 
-        for chat_element in visible_chats:
-            chat_data = extract_chat_data(chat_element)
-            if chat_data and chat_data["chat_name"] != "Unknown":
-                if chat_data["chat_name"] not in processed_chats:
-                    current_batch_chats.append(chat_data)
-                    processed_chats.add(chat_data["chat_name"])
+        for chat in visible_chats:
+            chat_data = extract_chat_data(chat)
+            if chat_names is not None and chat_data["chat_name"] not in chat_names:
+                continue
+            if chat_data["chat_name"] != "Unknown":
+                if chat_data["id"] not in processed_chats:
+                    processed_chats.add(chat_data["id"])
                     new_chats_found += 1
+                    if remaining_names is not None:
+                        remaining_names.discard(chat_data["chat_name"])
+
+                    # The phone comes from the chat name, so a chat saved under
+                    # a contact name can never be stored; keep it out of the batch
+                    phone = clean_phone_number(chat_data["chat_name"])
+                    if not phone or len(phone) < MIN_PHONE_LENGTH:
+                        if DEBUG:
+                            print(f"  {chat_data['chat_name']} has no phone number, skipping")
+                        continue
+                    # Known numbers aren't reopened, in full or targeted scans
+                    if phone in _SEEN_PHONES:
+                        if DEBUG:
+                            print(f"  {chat_data['chat_name']} already saved, skipping")
+                        continue
+                    # So are chats already read, in this run or an earlier one
+                    if (
+                        chat_data["last_message"] != NO_PREVIEW
+                        and _SCANNED_CHATS.get(chat_data["id"]) == chat_data["last_message"]
+                    ):
+                        if DEBUG:
+                            print(f"  {chat_data['chat_name']} unchanged since last read, skipping")
+                        continue
+                    chat_data["phone"] = phone
+                    current_batch_chats.append(chat_data)
 
         if new_chats_found == 0:
             print("No new chats in this batch, scrolling...")
-            scroll_down_and_get_chats(driver, container)
+            scroll_down_and_get_chats(driver)
             no_new_chats_count += 1
             continue
         else:
             no_new_chats_count = 0  # Reset counter
 
-        print(f"Found {new_chats_found} new chats to process in this batch")
-
-        # Process each chat in current batch
-        batch_saved = 0
-        for i, chat_data in enumerate(current_batch_chats):
-            try:
-                print(
-                    f"\n  [{i + 1}/{len(current_batch_chats)}] Opening {chat_data['chat_name']}..."
-                )
+        print(
+            f"Found {new_chats_found} new chats in this batch, {len(current_batch_chats)} to process"
+        )
 
-                # Click chat
-                if click_chat_element(
-                    driver, chat_data["element"], chat_data["chat_name"]
-                ):
-                    # Get last 10 messages to search for emails
-                    messages = get_last_messages_from_open_chat(driver, num_messages=10)
+        # Process each chat in current batch; verified contacts are saved together
+        pending_verifications = []
+        scanned_chats = []  # Read without an email; recorded with the batch
+        try:
+            for i, chat_data in enumerate(current_batch_chats):
+                try:
+                    phone = chat_data["phone"]
+
+                    # An email in the sidebar preview is found without opening the chat
+                    email_result = find_email_in_preview(chat_data)
+                    if email_result:
+                        print(
+                            f"\n  [{i + 1}/{len(current_batch_chats)}] {chat_data['chat_name']}: email in preview, not opening"
+                        )
+                        source = "    Read from chat list preview"
+                        message_count = 1
+                    elif preview_only:
+                        if DEBUG:
+                            print(f"  {chat_data['chat_name']}: no email in preview, skipping")
+                        continue
+                    else:
+                        print(
+                            f"\n  [{i + 1}/{len(current_batch_chats)}] Opening {chat_data['chat_name']}..."
+                        )
 
-                    if messages:
-                        print(f"    Retrieved {len(messages)} messages")
+                        # Click chat
+                        if not click_chat(driver, chat_data["id"], chat_data["chat_name"]):
+                            print("    ❌ Could not open chat")
+                            continue
 
-                        # Search for email in all messages
-                        email_result = find_email_in_messages(messages)
+                        # Search the last 10 messages for an email
+                        email_result, message_count = find_email_in_open_chat(
+                            driver, num_messages=10
+                        )
+                        source = f"    Retrieved {message_count} messages"
 
-                        # Extract phone from chat name
-                        phone = clean_phone_number(chat_data["chat_name"])
+                    if message_count:
+                        # The chat's report goes out in one print (one write)
+                        report = [source, f"    Phone: {phone}"]
 
                         if email_result:
-                            print(f"    Phone: {phone}")
-                            print(
-                                f"    Email: {email_result['email']} (found in message #{email_result['message_position']})"
-                            )
-                            print(f"    Found in: {email_result['found_in_message']}")
-                            print(f"    Direction: {email_result['direction']}")
-
-                            # Save to database if both phone and email exist
-                            if phone and email_result["email"]:
-                                if save_contact(phone, email_result["email"]):
-                                    print("    💾 Saved to database!")
-                                    batch_saved += 1
-                                    total_saved += 1
-                                else:
-                                    print("    📝 Already exists")
+                            report += [
+                                f"    Email: {email_result['email']} (found in message #{email_result['message_position']})",
+                                f"    Found in: {email_result['found_in_message']}",
+                                f"    Direction: {email_result['direction']}",
+                            ]
+
+                            # Verify now, save with the rest of the batch
+                            if email_result["email"] in queued_emails:
+                                report.append("    ⏭️  Email already queued in this scan")
+                            elif phone and email_result["email"]:
+                                queued_emails.add(email_result["email"])
+                                # The API call overlaps with opening the next chat
+                                pending_verifications.append(
+                                    VERIFY_POOL.submit(
+                                        verify_contact, phone, email_result["email"]
+                                    )
+                                )
+                                report.append("    🔎 Verification queued")
                             else:
-                                print("    ⚠️  Missing phone")
+                                report.append("    ⚠️  Missing phone")
                         else:
-                            print(f"    Phone: {phone}")
-                            print(
-                                f"    Email: Not found in last {len(messages)} messages"
-                            )
-                            print("    ⚠️  No email found")
+                            report += [
+                                f"    Email: Not found in last {message_count} messages",
+                                "    ⚠️  No email found",
+                            ]
+                            # Without a preview there is no way to tell it changed later
+                            if chat_data["last_message"] != NO_PREVIEW:
+                                scanned_chats.append(
+                                    (chat_data["id"], chat_data["last_message"])
+                                )
+                        print("\n".join(report))
 
                         total_processed += 1
                         if total_processed >= 20:
                             break
                     else:
                         print("    ⚠️  No messages found")
-                else:
-                    print("    ❌ Could not open chat")
-
-            except Exception as e:
-                print(f"    ❌ Error processing chat: {e}")
-                continue
 
+                except Exception as e:
+                    print(f"    ❌ Error processing chat: {e}")
+                    continue
+        finally:
+            # Saved even if the batch is cut short, since the API calls
+            # for these contacts have already been made
+            verified_rows = [f.result() for f in pending_verifications]
+            batch_saved = save_contacts_bulk(
+                [row for row in verified_rows if row], scanned_chats
+            )
+        total_saved += batch_saved
         print(f"  Batch {batch_count} completed: {batch_saved} new contacts saved")
 
         # Scroll down for next batch
         if batch_count < 100:  # Reasonable limit
-            scroll_down_and_get_chats(driver, container, scroll_amount=5)
-            time.sleep(0.5)
+            scroll_down_and_get_chats(driver, scroll_amount=5)
         else:
             print("Reached maximum batch limit")
             break
@@ -708,32 +1254,85 @@ def process_chats_with_scrolling(driver):
     return total_processed, total_saved
 
 
+def cdp_eval(driver, expression):
+    """Evaluate a JS expression in the page through CDP and return its value"""
+    result = driver.execute_cdp_cmd(
+        "Runtime.evaluate", {"expression": expression, "returnByValue": True}
+    )
+    return result.get("result", {}).get("value")
+
+
+def watch_chat_list(driver):
+    """
+    Install the chat list observer, unless it already watches this chat list
+    Returns False if the chat list isn't there to watch
+    """
+    try:
+        return bool(driver.execute_script(WATCH_CHAT_LIST_SCRIPT))
+    except Exception as e:
+        print(f"Error watching chat list: {e}")
+        return False
+
+
+def wait_for_chat_updates(driver, poll_interval=CHAT_POLL_INTERVAL):
+    """
+    Block until the chat list observer reports changed chats
+    Returns their names, or None (rescan everything) after FULL_SCAN_INTERVAL
+    without changes, so rows the observer never saw are still picked up
+    """
+    if not watch_chat_list(driver):
+        time.sleep(FULL_SCAN_INTERVAL)
+        return None
+    # Rows the scan itself changed would otherwise trigger another scan at once
+    cdp_eval(driver, CLEAR_NEW_CHATS_EXPRESSION)
+
+    deadline = time.monotonic() + FULL_SCAN_INTERVAL
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        names = cdp_eval(driver, DRAIN_NEW_CHATS_EXPRESSION)
+        if names is None:
+            # WhatsApp re-rendered the chat list; watch the new one
+            if not watch_chat_list(driver):
+                return None
+            continue
+        if names:
+            return set(names)
+    return None
+
+
 def print_database_stats():
     """Print current database statistics"""
-    contacts = get_all_contacts()
+    total_count, verified_count, latest = get_contact_stats(latest=3)
     print("\n📊 Database Stats:")
-    print(f"   Total contacts: {len(contacts)}")
+    print(f"   Total contacts: {total_count}")
 
-    verified_count = sum(
-        1 for contact in contacts if contact[2]
-    )  # is_verified is at index 2
-    unverified_count = len(contacts) - verified_count
+    unverified_count = total_count - verified_count
 
     print(f"   Verified contacts: {verified_count}")
     print(f"   Unverified contacts: {unverified_count}")
 
-    if contacts:
+    if latest:
         print("   Latest contacts:")
-        for phone, email, is_verified, created_at in contacts[:3]:  # Show latest 3
+        for phone, email, is_verified, created_at in latest:  # Show latest 3
             status = "✓" if is_verified else "✗"
             print(f"     • {phone} - {email} [{status}] ({created_at})")
 
 
-def main():
+def run_account(account=None, headless=False, preview_only=False, driver_path=None):
+    """
+    Scan and watch one WhatsApp account until stopped
+    driver_path is the chromedriver main() already resolved, so account
+    processes don't each run ChromeDriverManager (spawned ones inherit nothing)
+    """
+    global _ACCOUNT, _DRIVER_PATH
+    _ACCOUNT = account or ""
+    if driver_path:
+        _DRIVER_PATH = driver_path
+
     # Initialize database
     init_database()
 
-    driver = make_driver()
+    driver = make_driver(get_profile_dir(account), headless=headless)
 
     if not wait_for_login(driver):
         driver.quit()
@@ -742,18 +1341,25 @@ def main():
     try:
         print_database_stats()
 
+        chat_names = None  # The first scan covers the whole list
         while True:
-            print(f"\n--- Starting scan at {datetime.now().strftime('%H:%M:%S')} ---")
+            print(f"\n--- Starting scan at {time.strftime('%H:%M:%S')} ---")
 
-            # Process all chats with automatic scrolling
-            processed, saved = process_chats_with_scrolling(driver)
+            # Process all chats (or the changed ones) with automatic scrolling
+            processed, saved = process_chats_with_scrolling(
+                driver, chat_names, preview_only=preview_only
+            )
 
             if processed == 0:
                 print("No chats found or processed")
 
             print_database_stats()
-            print("\nWaiting 30 seconds before next full scan...")
-            time.sleep(30)
+            print("\nWaiting for chat list updates...")
+            chat_names = wait_for_chat_updates(driver)
+            if chat_names:
+                print(f"🔔 {len(chat_names)} chat(s) updated: {', '.join(sorted(chat_names))}")
+            else:
+                print("🔄 No updates reported, rescanning all chats")
 
     except KeyboardInterrupt:
         print("\n🛑 Stopped by user")
@@ -765,5 +1371,34 @@ def main():
         print("Browser closed.")
 
 
+def main():
+    """
+    Run one account, or with --accounts a,b,... one process per account.
+    Each account gets its own Chrome profile (and QR login on first run);
+    the processes overlap their waits on the browser and the verify API.
+    --headless runs Chrome without a window, for profiles already logged in.
+    --preview-only never opens a chat; it only reads the chat list previews,
+    so emails sent before a chat's last message are missed.
+    """
+    headless = "--headless" in sys.argv
+    preview_only = "--preview-only" in sys.argv
+    accounts = None
+    if "--accounts" in sys.argv:
+        index = sys.argv.index("--accounts") + 1
+        if index < len(sys.argv):
+            accounts = [a for a in sys.argv[index].split(",") if a]
+
+    if not accounts:
+        run_account(headless=headless, preview_only=preview_only)
+        return
+
+    # Resolved once here and passed on, whatever the start method
+    driver_path = get_driver_path()
+    n = len(accounts)
+    with ProcessPoolExecutor(max_workers=n) as executor:
+        flags = [headless] * n, [preview_only] * n, [driver_path] * n
+        list(executor.map(run_account, accounts, *flags))
+
+
 if __name__ == "__main__":
     main()